@@ -1,20 +1,38 @@
+import sys
+import time
+from importlib import metadata
 
+_phase_start = time.perf_counter()
+_phase_times = []
+
+def _end_phase(phase: str) -> None:
+    #Records how long each loading phase took, they're logged once the nodes are loaded
+    global _phase_start
+    now = time.perf_counter()
+    _phase_times.append(f"{phase}: {(now - _phase_start) * 1000:.1f}ms")
+    _phase_start = now
 
-import sys
 #from .mng_json import json_manager
 from .mng_json import json_manager
+_end_phase("mng_json import")
 
 #Diagnostic version print to detect incompatible openai versions
-import openai
+#The version comes from the package metadata so openai itself isn't imported until a node makes a request
+try:
+    openai_version = metadata.version('openai')
+except metadata.PackageNotFoundError:
+    openai_version = "not installed"
 
 print(f"Plush - Running on python installation: {sys.executable}, ver: {sys.version}")
-print("Plush - Current Openai Version: ", openai.__version__)
+print("Plush - Current Openai Version: ", openai_version)
+_end_phase("version check")
 
 jmanager = json_manager()
 if jmanager.on_startup(False):
     jmanager.log_events("config.json was updated")
 else:
     jmanager.log_events("config.json was not updated")
+_end_phase("startup")
 
 __version__ ="1.20.3"
 print('Plush - Version:', __version__)
@@ -27,6 +45,8 @@ from .UtilNodes import NODE_CLASS_MAPPINGS as utilClassMappings, NODE_DISPLAY_NA
 NODE_CLASS_MAPPINGS = {**styClassMappings, **utilClassMappings}
 
 NODE_DISPLAY_NAME_MAPPINGS = {**styDisplay, **utilDisplay}
+_end_phase("node import")
 
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
 
+jmanager.log_events(f"Plush - Load times, {', '.join(_phase_times)}")
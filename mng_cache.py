@@ -0,0 +1,418 @@
+
+from __future__ import annotations
+import json
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from enum import Enum
+from pathlib import Path
+from typing import Optional, Any, Union
+from .mng_json import json_manager, TroubleSgltn
+from .mng_lazy import LazyModule
+
+np = LazyModule('numpy')
+
+
+class CacheMode(Enum):
+    """
+    User selectable cache behaviour.  The values are the strings shown in the node UI.
+    """
+    OFF = "Off"
+    READ_WRITE = "Read/Write"
+    READ_ONLY = "Read Only"
+
+    @classmethod
+    def from_ui(cls, value: Union[str, 'CacheMode', None]) -> 'CacheMode':
+        #Unconnected or unknown values are treated as Off
+        if isinstance(value, cls):
+            return value
+        for mode in cls:
+            if mode.value == value:
+                return mode
+        return cls.OFF
+
+    @classmethod
+    def ui_list(cls) -> list:
+        return [mode.value for mode in cls]
+
+
+class ResponseCache:
+    """
+    A content-addressed cache for API responses.  Entries live in an in-memory LRU
+    backed by one JSON file per entry in a namespaced sub-directory of Plush's 'cache' directory,
+    so they survive a ComfyUI restart.  Entries are evicted by age (ttl) and by count, both
+    in memory and on disk.  Use ResponseCache.get_cache(namespace) to share one instance per namespace.
+    """
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, namespace: str, ttl_seconds: float = 0, max_entries: int = 256, max_disk_entries: int = 2048):
+        """
+        Args:
+            namespace (str): Sub-directory name that keeps this cache's files separate from other caches
+            ttl_seconds (float): Maximum age of an entry, 0 means entries don't expire
+            max_entries (int): Maximum number of entries held in memory
+            max_disk_entries (int): Maximum number of entry files kept on disk
+        """
+        self.j_mngr = json_manager()
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.max_disk_entries = max(1, max_disk_entries)
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._disk_count = None
+        self.cache_dir = self.j_mngr.find_child_directory(self.j_mngr.cache_dir, namespace, True, False)
+
+
+    @classmethod
+    def get_cache(cls, namespace: str, **kwargs) -> 'ResponseCache':
+        """
+        Returns the shared cache for namespace, creating it on first use.
+        Keyword arguments are passed to the constructor and update the limits of an existing instance.
+        """
+        with cls._instances_lock:
+            cache = cls._instances.get(namespace)
+            if cache is None:
+                cache = cls(namespace, **kwargs)
+                cls._instances[namespace] = cache
+            else:
+                if 'ttl_seconds' in kwargs:
+                    cache.ttl_seconds = kwargs['ttl_seconds']
+                if 'max_entries' in kwargs:
+                    cache.max_entries = max(1, kwargs['max_entries'])
+                if 'max_disk_entries' in kwargs:
+                    cache.max_disk_entries = max(1, kwargs['max_disk_entries'])
+            return cache
+
+
+    @staticmethod
+    def make_key(payload: Any) -> str:
+        """
+        Creates a stable hash from a JSON serializable payload.  Dict key order doesn't affect the key.
+
+        Args:
+            payload (Any): The request payload, e.g. the model, messages and sampling settings
+
+        Returns:
+            str: A sha256 hex digest
+        """
+        canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+    def _entry_path(self, key: str) -> Optional[Path]:
+        if not self.cache_dir:
+            return None
+        return Path(self.cache_dir) / f"{key}.json"
+
+
+    def _is_expired(self, created: float) -> bool:
+        return bool(self.ttl_seconds) and (time.time() - created) > self.ttl_seconds
+
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Looks up a cached value, checking memory first and then disk.  Updates the hit/miss counters.
+
+        Args:
+            key (str): A key created by make_key()
+
+        Returns:
+            The cached value or None on a miss
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._is_expired(created):
+                    self._memory.move_to_end(key)
+                    self._touch(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+
+            entry_path = self._entry_path(key)
+            if entry_path and entry_path.is_file():
+                try:
+                    with open(entry_path, 'r', encoding='utf-8') as file:
+                        entry = json.load(file)
+                    created, value = entry['created'], entry['value']
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    self.j_mngr.log_events(f"Discarding unreadable cache entry {entry_path.name}: {e}",
+                                           TroubleSgltn.Severity.WARNING)
+                    self._remove(key)
+                else:
+                    if not self._is_expired(created):
+                        self._remember(key, created, value)
+                        self._touch(key)
+                        self.hits += 1
+                        return value
+                    self._remove(key)
+
+            self.misses += 1
+            return None
+
+
+    def put(self, key: str, value: Any) -> bool:
+        """
+        Stores a JSON serializable value in memory and on disk.
+
+        Args:
+            key (str): A key created by make_key()
+            value (Any): The value to cache
+
+        Returns:
+            bool: True if the value was written to disk
+        """
+        created = time.time()
+        with self._lock:
+            self._remember(key, created, value)
+            entry_path = self._entry_path(key)
+            if not entry_path:
+                return False
+            is_new = not entry_path.exists()
+            try:
+                with open(entry_path, 'w', encoding='utf-8') as file:
+                    json.dump({'created': created, 'value': value}, file)
+            except (OSError, TypeError) as e:
+                self.j_mngr.log_events(f"Unable to write cache entry to {entry_path}: {e}",
+                                       TroubleSgltn.Severity.WARNING)
+                return False
+            if is_new and self._disk_count is not None:
+                self._disk_count += 1
+            self._trim_disk()
+            return True
+
+
+    def _remember(self, key: str, created: float, value: Any) -> None:
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+    def _touch(self, key: str) -> None:
+        #_trim_disk evicts by mtime, so a hit marks the entry as recently used. Expiry uses 'created', not mtime
+        entry_path = self._entry_path(key)
+        if entry_path:
+            try:
+                os.utime(entry_path)
+            except OSError:
+                pass
+
+
+    def _remove(self, key: str) -> None:
+        self._memory.pop(key, None)
+        entry_path = self._entry_path(key)
+        if entry_path:
+            try:
+                entry_path.unlink()
+                if self._disk_count is not None:
+                    self._disk_count -= 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.j_mngr.log_events(f"Unable to delete cache entry {entry_path}: {e}",
+                                       TroubleSgltn.Severity.WARNING)
+
+
+    def _trim_disk(self) -> None:
+        #Directory scans only happen when the entry limit is exceeded
+        if not self.cache_dir:
+            return
+        if self._disk_count is None:
+            self._disk_count = sum(1 for _ in Path(self.cache_dir).glob('*.json'))
+        if self._disk_count <= self.max_disk_entries:
+            return
+        entries = []
+        for file in Path(self.cache_dir).glob('*.json'):
+            try:
+                entries.append((file.stat().st_mtime, file))
+            except OSError:
+                continue
+        entries.sort()
+        excess = len(entries) - self.max_disk_entries
+        for _, file in entries[:max(0, excess)]:
+            self._remove(file.stem)
+        self._disk_count = min(len(entries), self.max_disk_entries)
+
+
+    def stats(self) -> str:
+        """
+        Returns a short hit/miss summary suitable for the troubleshooting output.
+        """
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0
+        return f"Cache '{self.namespace}': {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate)"
+
+
+class ImageArtifactCache:
+    """
+    A Singleton on-disk cache for generated images.  Each entry is a directory holding the images as one
+    raw uint8 [N, H, W, C] .npy array, which is memory-mapped on load so a hit needs no image decoding,
+    plus a JSON file of metadata such as the revised prompt.  Entries are evicted least recently used
+    first once the total size of the cached images passes max_bytes.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.j_mngr = json_manager()
+            cls._instance.cache_dir = cls._instance.j_mngr.find_child_directory(cls._instance.j_mngr.cache_dir, 'images', True, False)
+            cls._instance.max_bytes = 2 * 1024**3
+            cls._instance._lock = threading.RLock()
+            cls._instance._index = None
+        return cls._instance
+
+
+    def _load_index(self) -> dict:
+        #key -> (last access time, bytes), built from the entry directories on first use
+        if self._index is None:
+            self._index = {}
+            if self.cache_dir:
+                for entry in Path(self.cache_dir).iterdir():
+                    if entry.name.startswith('.'):
+                        #Left over from an interrupted write
+                        shutil.rmtree(entry, ignore_errors=True)
+                        continue
+                    meta_file = entry / 'meta.json'
+                    images_file = entry / 'images.npy'
+                    try:
+                        self._index[entry.name] = (meta_file.stat().st_mtime, images_file.stat().st_size)
+                    except OSError:
+                        continue
+        return self._index
+
+
+    def get(self, key: str) -> Optional[tuple[np.ndarray, dict]]:
+        """
+        Args:
+            key (str): A key created by ResponseCache.make_key()
+
+        Returns:
+            tuple: (read-only memory-mapped uint8 image array, metadata dict) or None on a miss
+        """
+        if not self.cache_dir:
+            return None
+        with self._lock:
+            index = self._load_index()
+            if key not in index:
+                return None
+            entry = Path(self.cache_dir) / key
+            try:
+                with open(entry / 'meta.json', 'r', encoding='utf-8') as file:
+                    meta = json.load(file)
+                images = np.load(entry / 'images.npy', mmap_mode='r')
+                os.utime(entry / 'meta.json')  # Marks the entry as recently used
+            except (OSError, ValueError) as e:
+                self.j_mngr.log_events(f"Discarding unreadable image cache entry {key}: {e}",
+                                       TroubleSgltn.Severity.WARNING)
+                self._remove(key)
+                return None
+            index[key] = (time.time(), index[key][1])
+            return images, meta
+
+
+    def put(self, key: str, images: np.ndarray, meta: dict) -> bool:
+        """
+        Stores a uint8 image array and its metadata, then evicts old entries if the cache is over its size limit.
+        Arrays larger than max_bytes aren't stored.
+        The entry is written to a temporary directory and renamed into place so readers never see a partial entry.
+
+        Args:
+            key (str): A key created by ResponseCache.make_key()
+            images (np.ndarray): uint8 [N, H, W, C] images
+            meta (dict): JSON serializable metadata
+
+        Returns:
+            bool: True if the entry was stored
+        """
+        if not self.cache_dir:
+            return False
+        images = np.ascontiguousarray(images, dtype=np.uint8)
+        if images.nbytes > self.max_bytes:
+            #It would be evicted as soon as it was written
+            self.j_mngr.log_events(f"Image cache entry {key} is {images.nbytes} bytes, larger than the cache limit of {self.max_bytes} bytes; not cached",
+                                   TroubleSgltn.Severity.INFO)
+            return False
+        entry = Path(self.cache_dir) / key
+        temp_entry = Path(self.cache_dir) / f".{key}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                temp_entry.mkdir(exist_ok=True)
+                np.save(temp_entry / 'images.npy', images)
+                with open(temp_entry / 'meta.json', 'w', encoding='utf-8') as file:
+                    json.dump(meta, file)
+                if entry.exists():
+                    self._remove(key)
+                os.replace(temp_entry, entry)
+            except (OSError, TypeError) as e:
+                self.j_mngr.log_events(f"Unable to write image cache entry {key}: {e}",
+                                       TroubleSgltn.Severity.WARNING)
+                shutil.rmtree(temp_entry, ignore_errors=True)
+                return False
+            self._load_index()[key] = (time.time(), (entry / 'images.npy').stat().st_size)
+            self._evict()
+            return True
+
+
+    def _remove(self, key: str) -> None:
+        shutil.rmtree(Path(self.cache_dir) / key, ignore_errors=True)
+        self._load_index().pop(key, None)
+
+
+    def _evict(self) -> None:
+        index = self._load_index()
+        total = sum(size for _, size in index.values())
+        if total <= self.max_bytes:
+            return
+        for key, (_, size) in sorted(index.items(), key=lambda item: item[1][0]):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+            self.j_mngr.log_events(f"Evicted image cache entry {key} ({size / 1024**2:.1f} MB)")
+
+
+class LRUCache:
+    """
+    A small thread safe in-memory LRU for results that are expensive to recompute.
+    The least recently used entry is dropped once max_entries is reached.
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
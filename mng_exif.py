@@ -0,0 +1,334 @@
+
+from __future__ import annotations
+import os
+import pickle
+import struct
+import zlib
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Any, Callable
+from .mng_json import json_manager, TroubleSgltn
+from .mng_lazy import LazyModule
+
+#PIL is only imported when an image isn't a PNG or has Exif data to convert
+Image = LazyModule('PIL.Image')
+TiffImagePlugin = LazyModule('PIL.TiffImagePlugin')
+
+
+#Metadata extraction shared by the Exif Wrangler nodes.  Everything here is a module level function
+#so it can be pickled and run in a worker process by the batch node.
+
+#Exif and Xmp keys with their friendly names
+EXIF_KEYS = {'Exif.Photo.UserComment': 'User Comment',
+             'Exif.Image.Make': 'Make',
+             'Exif.Image.Model': 'Model',
+             'Exif.Image.Orientation': 'Image Orientation',
+             'Exif.Photo.PixelXDimension': 'Pixel Width',
+             'Exif.Photo.PixelYDimension': 'Pixel Height',
+             'Exif.Photo.ISOSpeedRatings': 'ISO',
+             'Exif.Image.DateTime':'Created: Date_Time',
+             'Exif.Photo.ShutterSpeedValue': 'Shutter Speed',
+             'Exif.Photo.ExposureTime': 'Exposure Time',
+             'Exif.Photo.Flash': "Flash",
+             'Exif.Photo.FocalLength': 'Lens Focal Length',
+             'Exif.Photo.FocalLengthIn35mmFilm': 'Lens 35mm Equiv. Focal Length',
+             'Exif.Photo.ApertureValue': 'Aperture',
+             'Exif.Photo.MaxApertureValue': 'Maximum Aperture',
+             'Exif.Photo.FNumber': 'f-stop',
+             'Exif.Image.Artist': 'Artist',
+             'Exif.Image.ExposureTime': 'Exposure Time',
+             'Exif.Image.MaxApertureValue': 'Camera Smallest Apeture',
+             'Exif.Image.MeteringMode': 'Metering Mode',
+             'Exif.Image.Flash': 'Flash',
+             'Exif.Image.FocalLength': 'Focal Length',
+             'Exif.Image.ExposureIndex': 'Exposure',
+             'Exif.Image.ImageDescription': 'Image Description',
+             'Xmp.OPMedia.IsHDRActive': 'HDR Active',
+             'Xmp.crs.UprightFocalLength35mm': '35mm Equiv Focal Length',
+             'Xmp.crs.LensProfileMatchKeyExifMake': 'Lens Make',
+             'Xmp.crs.LensProfileMatchKeyCameraModelName': 'Lens Model',
+             'Xmp.crs.CameraProfile': 'Camera Profile',
+             'Xmp.crs.WhiteBalance': 'White Balance',
+             'Xmp.xmp.CreateDate': 'Creation Date',
+             }
+
+#AI generation workflow keys with their friendly names
+TRANSLATE_KEYS = {'widgets_values': 'Possible Prompts',
+                  'text': 'Possible Prompts',
+                  'steps': 'Steps',
+                  'cfg': 'CFG',
+                  'seed': 'Seed',
+                  'noise_seed': 'Seed',
+                  'ckpt_name': 'Models',
+                  'resolution': 'Image Size',
+                  'sampler_name': 'Sampler',
+                  'scheduler': 'Scheduler',
+                  'lora': 'Lora',
+                  'denoise': 'Denoise',
+                  'GPTmodel': 'OpenAI Model',
+                  'image_size': 'Image Size',
+                  'image_quality': 'Dall-e Image Quality',
+                  'style': 'Style',
+                  'batch_size': 'Batch Size',
+                  'ew_file': 'Source File',
+                  'ew_id': 'Processing Application'
+                  }
+
+ALL_KEYS = {**EXIF_KEYS, **TRANSLATE_KEYS}
+
+#Every friendly name in the order it first appears, e.g. for the columns of a .csv file
+FRIENDLY_NAMES = list(dict.fromkeys(ALL_KEYS.values()))
+
+#Keys in the PNG info whose values hold the AI generation workflow
+EXTRACT_VALUES = ['widgets_values','inputs']
+
+#Friendly names whose duplicate values are removed
+DEDUPE_KEYS = ['Possible Prompts',]
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def sanitize_data(v):
+
+    def contains_nonprintable(s):
+        # Tests for the presence of disallowed non printable chars
+        allowed_nonprintables = {'\n', '\r', '\t'}
+        return any(c not in allowed_nonprintables and not c.isprintable() for c in s)
+
+    if isinstance(v, bytes):
+        # Attempt to decode byte data
+        decoded_str = v.decode('utf-8', errors='replace')
+        # Check if the result contains any non-allowed non-printable characters
+        if not contains_nonprintable(decoded_str):
+            return decoded_str
+        return None
+    elif isinstance(v, TiffImagePlugin.IFDRational):
+        if v.denominator == 0:
+            return None
+        return float(v)
+    elif isinstance(v, tuple):
+        return tuple(sanitize_data(t) for t in v if sanitize_data(t) is not None)
+    elif isinstance(v, dict):
+        return {kk: sanitize_data(vv) for kk, vv in v.items() if sanitize_data(vv) is not None}
+    elif isinstance(v, list):
+        return [sanitize_data(item) for item in v if sanitize_data(item) is not None]
+    else:
+        return v
+
+
+def build_meta_data(image_path: str, info: dict, exiv_exif: dict, exiv_iptc: dict, exiv_xmp: dict, exiv_comment: dict) -> dict:
+    """
+    Combines the PIL image info and the pyexiv2 Exif, Iptc, Xmp and comment data into one working dict.
+
+    Args:
+        image_path (str): Path of the image the data came from
+        info (dict): The PIL Image.info dict
+        exiv_exif, exiv_iptc, exiv_xmp, exiv_comment (dict): The data read by pyexiv2
+
+    Returns:
+        dict: The sanitized and combined metadata
+    """
+    j_mngr = json_manager()
+
+    if not exiv_comment:
+        exiv_comment = {'comment':'null'}
+
+    exiv_tag = {'processing_details':{
+                     'ew_file': os.path.basename(image_path),
+                     'path': image_path,
+                     'ew_id':'ComfyUI: Plush Exif Wrangler'
+                }
+    }
+    exiv_comm = {**exiv_comment, **exiv_tag}
+
+    # Sanitize and combine data
+    sanitized_exiv2 = {k: sanitize_data(v) for k, v in exiv_exif.items()} if exiv_exif else {}
+    sanitized_xmp = {k: sanitize_data(v) for k, v in exiv_xmp.items()} if exiv_xmp else {}
+
+    #extract the pertinent data subset from info
+    extracted_info = j_mngr.extract_from_dict(info, EXTRACT_VALUES)
+
+    return {**sanitized_xmp, **exiv_iptc,  **exiv_comm,**sanitized_exiv2, **extracted_info}
+
+
+def translate_meta_data(working_meta_data: dict, min_prompt_len: int, alpha_pct: float, filter_term: str) -> dict:
+    """
+    Runs the extract_with_translation pipeline over the working metadata and removes duplicate prompts.
+
+    Returns:
+        dict: Friendly names with their values
+    """
+    j_mngr = json_manager()
+    working_dict = j_mngr.extract_with_translation(working_meta_data, ALL_KEYS, min_prompt_len, alpha_pct, filter_term)
+    #Remove possible candidate prompt duplicates
+    j_mngr.remove_duplicates_from_keys(working_dict, DEDUPE_KEYS)
+    return working_dict
+
+
+def read_file_bytes(image_path: str) -> bytes:
+    #One read of the whole file, pyexiv2's ImageData only accepts a bytes object
+    with open(image_path, 'rb') as file:
+        return file.read()
+
+
+def parse_png_text(data: bytes) -> dict:
+    """
+    Reads the tEXt, zTXt and iTXt chunks of a PNG file, which is where ComfyUI saves the prompt and workflow.
+    Like PIL's Image.info, only the chunks before the image data are read, the pixel data is skipped.
+
+    Args:
+        data (bytes): The PNG file
+
+    Returns:
+        dict: Text chunk keywords with their text
+    """
+    info = {}
+    pos = len(PNG_SIGNATURE)
+    end = len(data)
+    while pos + 8 <= end:
+        length, chunk_type = struct.unpack_from('>I4s', data, pos)
+        start = pos + 8
+        stop = start + length
+        if chunk_type in (b'IDAT', b'IEND') or stop > end:
+            break
+        pos = stop + 4  # Skips the CRC
+        if chunk_type not in (b'tEXt', b'zTXt', b'iTXt'):
+            continue
+        key, _, value = data[start:stop].partition(b'\0')
+        try:
+            if chunk_type == b'tEXt':
+                text = value.decode('latin-1')
+            elif chunk_type == b'zTXt':
+                # value[0] is the compression method, zlib is the only one defined
+                text = zlib.decompress(value[1:]).decode('latin-1')
+            else:
+                compressed = value[:1] == b'\x01'
+                # Skip the compression flag and method, then the language tag and translated keyword
+                _, _, value = value[2:].partition(b'\0')
+                _, _, value = value.partition(b'\0')
+                text = (zlib.decompress(value) if compressed else value).decode('utf-8')
+        except (zlib.error, UnicodeDecodeError):
+            continue
+        info[key.decode('latin-1')] = text
+    return info
+
+
+def read_image_info(data: bytes, image_path: str = "") -> dict:
+    """
+    Returns the image info PIL's Image.info would, from the file bytes.  PNG text is parsed directly,
+    other formats are opened from memory by PIL without decoding the pixels.
+
+    Args:
+        data (bytes): The image file
+        image_path (str): Names the file in the error raised if PIL can't identify it
+    """
+    if data.startswith(PNG_SIGNATURE):
+        return parse_png_text(data)
+    try:
+        with Image.open(BytesIO(data)) as img:
+            return img.info
+    except Image.UnidentifiedImageError:
+        raise Image.UnidentifiedImageError(f"cannot identify image file '{image_path}'") from None
+
+
+def read_file_metadata(image_path: str, pyexiv2: Optional[Any] = None) -> dict:
+    """
+    Reads an image file once and returns its combined working metadata from the image info and the
+    pyexiv2 Exif, Iptc, Xmp and comment data.  Errors are raised to the caller.
+
+    Args:
+        image_path (str): The image file
+        pyexiv2 (module): The loaded pyexiv2 module, it's imported here when not passed in
+    """
+    if pyexiv2 is None:
+        import pyexiv2
+        pyexiv2.set_log_level(4) #Mute log level
+
+    image_data = read_file_bytes(image_path)
+    info = read_image_info(image_data, image_path)
+
+    with pyexiv2.ImageData(image_data) as exiv_img:
+        exiv_exif = exiv_img.read_exif()
+        exiv_iptc = exiv_img.read_iptc()
+        exiv_xmp = exiv_img.read_xmp()
+        exiv_comment = exiv_img.read_comment()
+
+    return build_meta_data(image_path, info, exiv_exif, exiv_iptc, exiv_xmp, exiv_comment)
+
+
+def extract_file_info(image_path: str, min_prompt_len: int, alpha_pct: float, filter_term: str) -> dict:
+    """
+    Batch worker:  extracts the translated metadata of one file.  It never raises, so one bad file
+    can't stop a batch.
+
+    Returns:
+        dict: {'path': image_path, 'data': translated dict} or {'path': image_path, 'error': message}
+    """
+    try:
+        working_meta_data = read_file_metadata(image_path)
+        return {'path': image_path,
+                'data': translate_meta_data(working_meta_data, min_prompt_len, alpha_pct, filter_term)}
+    except Exception as e:
+        return {'path': image_path, 'error': f"{type(e).__name__}: {e}"}
+
+
+def flatten_value(value) -> str:
+    #Lists of values, e.g. several Possible Prompts, become one ' | ' separated string
+    if isinstance(value, (list, tuple)):
+        return ' | '.join(flatten_value(item) for item in value)
+    return str(value)
+
+
+def _run_pool(pool, files: list, worker_args: tuple, max_workers: int, handle_result: Callable, done: set) -> None:
+    #Keeps only a few tasks per worker in flight so a large directory isn't queued all at once
+    file_iter = iter(files)
+    in_flight = {}
+
+    def submit_next():
+        path = next(file_iter, None)
+        if path is not None:
+            #Threads log to the caller's trouble log, worker processes can't share it
+            in_flight[TroubleSgltn.submit(pool, extract_file_info, path, *worker_args)] = path
+
+    for _ in range(max_workers * 4):
+        submit_next()
+    while in_flight:
+        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in finished:
+            path = in_flight.pop(future)
+            handle_result(future.result())
+            done.add(path)
+            submit_next()
+
+
+def extract_files(files: list, worker_args: tuple, max_workers: int, use_processes: bool, handle_result: Callable) -> int:
+    """
+    Streams files through extract_file_info in a process pool, or a thread pool if worker processes
+    can't be started, e.g. when they're unable to import this node pack.
+
+    Args:
+        files (list): The image paths
+        worker_args (tuple): (min_prompt_len, alpha_pct, filter_term)
+        max_workers (int): The number of worker processes or threads
+        use_processes (bool): False to only use threads
+        handle_result (Callable): Called in the calling thread with each extract_file_info result as it arrives
+
+    Returns:
+        int: The number of files processed
+    """
+    done = set()
+    workers = max(1, min(max_workers, len(files)))
+    if use_processes and workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                _run_pool(pool, files, worker_args, workers, handle_result, done)
+        except (BrokenProcessPool, OSError, pickle.PicklingError) as e:
+            json_manager().log_events(f"Worker processes are unavailable ({type(e).__name__}: {e}), continuing with threads",
+                                      TroubleSgltn.Severity.WARNING,
+                                      True)
+    remaining = [path for path in files if path not in done]
+    if remaining:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            _run_pool(pool, remaining, worker_args, workers, handle_result, done)
+    return len(done)
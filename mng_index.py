@@ -0,0 +1,244 @@
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Callable
+from .mng_json import json_manager, TroubleSgltn
+from .mng_exif import extract_files, flatten_value
+
+
+class MetadataIndex:
+    """
+    A Singleton SQLite index of the metadata Exif Wrangler extracts from images.  Each file is stored with
+    its mtime and size, so a refresh only re-parses files that are new or have changed since they were indexed.
+    Searches use an FTS5 full text index when the SQLite build has it and fall back to LIKE matching when it doesn't.
+    """
+    _instance = None
+
+    #Searchable fields: node UI name -> column
+    FIELDS = {"All": None,
+              "Possible Prompts": "prompts",
+              "Seed": "seed",
+              "Models": "models",
+              "Sampler": "sampler",
+              "Other": "other"}
+
+    #Friendly names with their own column, every other value goes in 'other'
+    FIELD_NAMES = {"Possible Prompts": "prompts", "Seed": "seed", "Models": "models", "Sampler": "sampler"}
+
+    IMAGE_PATTERNS = ('*.png', '*.jpg', '*.jpeg', '*.webp')
+
+    #Possible Prompt filter used for indexing: (min_prompt_len, alpha_pct, filter_term).  It's looser than
+    #Exif Wrangler's defaults so short prompts can still be found
+    PROMPT_FILTER = (20, 0.5, "")
+
+    #refresh() commits after this many parsed files so an interrupted refresh keeps most of its work
+    COMMIT_EVERY = 200
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.j_mngr = json_manager()
+            cls._instance._lock = threading.Lock()
+            cls._instance.db_path = os.path.join(cls._instance.j_mngr.cache_dir, 'metadata_index.sqlite3') if cls._instance.j_mngr.cache_dir else ""
+            cls._instance.has_fts = False
+            if cls._instance.db_path:
+                cls._instance._create()
+        return cls._instance
+
+
+    @contextmanager
+    def _connect(self):
+        #One connection per call, committed on success and always closed
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+    def _create(self) -> None:
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS files (
+                                id INTEGER PRIMARY KEY,
+                                path TEXT UNIQUE NOT NULL,
+                                mtime REAL NOT NULL,
+                                size INTEGER NOT NULL,
+                                data TEXT,
+                                prompts TEXT, seed TEXT, models TEXT, sampler TEXT, other TEXT)""")
+            try:
+                #Standalone FTS table whose rowid is files.id
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(prompts, seed, models, sampler, other)")
+                self.has_fts = True
+            except sqlite3.OperationalError as e:
+                self.has_fts = False
+                self.j_mngr.log_events(f"SQLite full text search is unavailable, metadata searches will be slower: {e}",
+                                       TroubleSgltn.Severity.WARNING)
+
+
+    def columns(self, data: dict) -> dict:
+        #Spreads a translated metadata dict over the searchable columns
+        columns = {column: [] for column in ('prompts', 'seed', 'models', 'sampler', 'other')}
+        for name, value in data.items():
+            columns[self.FIELD_NAMES.get(name, 'other')].append(flatten_value(value))
+        return {column: ' | '.join(values) for column, values in columns.items()}
+
+
+    @staticmethod
+    def scan(directories: list, recursive: bool = True, patterns: tuple = IMAGE_PATTERNS) -> dict:
+        """
+        Lists the image files in the directories with their mtime and size, without opening them.
+
+        Returns:
+            dict: path -> (mtime, size)
+        """
+        found = {}
+        for directory in directories:
+            root = Path(os.path.abspath(directory))
+            if not root.is_dir():
+                continue
+            for pattern in patterns:
+                for file in (root.rglob(pattern) if recursive else root.glob(pattern)):
+                    try:
+                        stat = file.stat()
+                    except OSError:
+                        continue
+                    if file.is_file():
+                        found[str(file)] = (stat.st_mtime, stat.st_size)
+        return found
+
+
+    def refresh(self, directories: list, max_workers: int = 4, recursive: bool = True, progress: Optional[Callable] = None) -> dict:
+        """
+        Brings the index up to date with the directories:  new and changed files are parsed and stored,
+        files that no longer exist are removed and unchanged files aren't opened.
+
+        Args:
+            directories (list): The directories to index
+            max_workers (int): Worker processes used to parse changed files
+            recursive (bool): Include sub-directories
+            progress (Callable): Optional, called with the number of files to parse, then with 1 for each parsed file
+
+        Returns:
+            dict: Counts of the 'scanned', 'parsed', 'removed' and 'failed' files
+        """
+        counts = {'scanned': 0, 'parsed': 0, 'removed': 0, 'failed': 0}
+        if not self.db_path:
+            return counts
+        found = self.scan(directories, recursive)
+        counts['scanned'] = len(found)
+        roots = tuple(os.path.join(os.path.abspath(directory), '') for directory in directories)
+
+        def in_scope(path):
+            #Only files the scan could have found are checked for deletion
+            if recursive:
+                return path.startswith(roots)
+            return os.path.join(os.path.dirname(path), '') in roots
+
+        with self._lock, self._connect() as conn:
+            indexed = {path: (mtime, size) for path, mtime, size in conn.execute("SELECT path, mtime, size FROM files")}
+            changed = [path for path, stamp in found.items() if indexed.get(path) != stamp]
+            stale = [path for path in indexed if in_scope(path) and path not in found]
+
+            for path in stale:
+                self._delete(conn, path)
+            counts['removed'] = len(stale)
+            conn.commit()
+
+            if progress:
+                progress(len(changed))
+
+            def handle_result(result):
+                if progress:
+                    progress(1)
+                path = result['path']
+                #Unreadable files are stored without data so they aren't retried until they change
+                data = result.get('data') or {}
+                if 'error' in result:
+                    counts['failed'] += 1
+                mtime, size = found[path]
+                self._delete(conn, path)
+                columns = self.columns(data)
+                cursor = conn.execute("INSERT INTO files (path, mtime, size, data, prompts, seed, models, sampler, other) VALUES (?,?,?,?,?,?,?,?,?)",
+                                      (path, mtime, size, json.dumps(data, ensure_ascii=False, default=str),
+                                       columns['prompts'], columns['seed'], columns['models'], columns['sampler'], columns['other']))
+                if self.has_fts:
+                    conn.execute("INSERT INTO files_fts (rowid, prompts, seed, models, sampler, other) VALUES (?,?,?,?,?,?)",
+                                 (cursor.lastrowid, columns['prompts'], columns['seed'], columns['models'], columns['sampler'], columns['other']))
+                counts['parsed'] += 1
+                if counts['parsed'] % self.COMMIT_EVERY == 0:
+                    conn.commit()
+
+            if changed:
+                extract_files(changed, self.PROMPT_FILTER, max_workers, True, handle_result)
+        return counts
+
+
+    def _delete(self, conn: sqlite3.Connection, path: str) -> None:
+        row = conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        if row:
+            if self.has_fts:
+                conn.execute("DELETE FROM files_fts WHERE rowid = ?", (row[0],))
+            conn.execute("DELETE FROM files WHERE id = ?", (row[0],))
+
+
+    @staticmethod
+    def fts_query(query: str, column: Optional[str]) -> str:
+        #Every word must match, each word is quoted so punctuation can't be read as FTS syntax
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        match = ' AND '.join(terms)
+        return f"{column} : ({match})" if column else match
+
+
+    def search(self, query: str, field: str = "All", limit: int = 20, within: tuple = ()) -> list:
+        """
+        Finds the indexed files whose metadata contains every word in the query.
+
+        Args:
+            query (str): The words to find, e.g. part of a prompt, a seed or a model name
+            field (str): One of FIELDS, limits the search to that field
+            limit (int): The most results returned
+            within (tuple): Optional directories the results must be in
+
+        Returns:
+            list: (path, metadata dict) tuples, best matches first when full text search is available
+        """
+        if not self.db_path or not query.strip():
+            return []
+        column = self.FIELDS.get(field)
+        start_time = time.perf_counter()
+        with self._connect() as conn:
+            if self.has_fts:
+                sql = "SELECT f.path, f.data FROM files_fts JOIN files f ON f.id = files_fts.rowid WHERE files_fts MATCH ?"
+                params = [self.fts_query(query, column)]
+            else:
+                sql = "SELECT f.path, f.data FROM files f WHERE 1=1"
+                params = []
+                searched = column or "(prompts || ' ' || seed || ' ' || models || ' ' || sampler || ' ' || other)"
+                for term in query.split():
+                    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                    sql += f" AND {searched} LIKE ? ESCAPE '\\'"
+                    params.append(f"%{escaped}%")
+            if within:
+                sql += " AND (" + " OR ".join("f.path LIKE ? ESCAPE '\\'" for _ in within) + ")"
+                params.extend(os.path.join(os.path.abspath(directory), '').replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                              for directory in within)
+            sql += " ORDER BY rank LIMIT ?" if self.has_fts else " ORDER BY f.path LIMIT ?"
+            params.append(limit)
+            try:
+                rows = conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as e:
+                self.j_mngr.log_events(f"Invalid metadata search '{query}': {e}",
+                                       TroubleSgltn.Severity.WARNING,
+                                       True)
+                return []
+        self.j_mngr.log_events(f"Metadata search found {len(rows)} matches in {(time.perf_counter() - start_time) * 1000:.1f}ms",
+                               is_trouble=True)
+        return [(path, json.loads(data) if data else {}) for path, data in rows]
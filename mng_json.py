@@ -2,25 +2,38 @@
 import json
 import os
 import shutil
+import atexit
+import queue
+import threading
+import multiprocessing.util
+import contextvars
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+import gzip
 from enum import Enum
 import bisect
-from datetime import datetime, timedelta
+from datetime import datetime
 import re
 import math
 import time
 from pathlib import Path
-from typing import Optional, Any,  Union
+from typing import Optional, Any,  Union, NamedTuple, Callable
+from collections import deque
 
 
 class TroubleSgltn:
     """
     A Singleton class that acts as a central hub for log messages logged using json_manager.log_events().
-    This class formats and stores these event messages until the reset() method is called, clearing the data and optionally
+    This class stores these event messages until the reset() method is called, clearing the data and optionally
     creating a process header describing the method or class that's the origin of the logs that follow. 
     Nodes that use this class should initialize with TroubleSgltn.reset('my_process') at the top of the main method at the start of the run. 
     If you want a more granular listing of the processes being logged you can append a new process header using set_process_header.
     The node's main method can then query the .get_troubles() method at the end of the run to fetch all stored log messages 
     and present them to the user in the return tuple: 'return(result, TroubleSgltn.get_trouble()').
+    Messages and headers are kept as records in a ring buffer of max_records, so a noisy run keeps its most recent
+    records and the report is only formatted when get_troubles() is called.
+    Each reset() starts a new trouble log in the current context (a contextvars.ContextVar), so nodes running at the
+    same time in different threads each get back only their own messages.  Work a node hands to other threads should
+    be started with TroubleSgltn.submit() or TroubleSgltn.bind() so its messages go to the node's log.
     """
     _instance = None
 
@@ -29,29 +42,90 @@ class TroubleSgltn:
         WARNING = 2
         ERROR = 3
 
+    class Record(NamedTuple):
+        #severity is None for a process header record, whose message is the process name
+        severity: Optional['TroubleSgltn.Severity']
+        message: str
+        process_head: str
+        timestamp: float
+
+    class _TroubleLog:
+        #The records of one run, shared by the threads working for it
+        def __init__(self, max_records: int):
+            self.records = deque(maxlen=max_records)
+            self.dropped = 0
+            self.header_stack = []
+            self.lock = threading.Lock()
+
+    MAX_RECORDS = 1000
+
+    _current_log = contextvars.ContextVar('plush_trouble_log')
+
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             # Initialize any necessary attributes here
-            cls._troubles = ""  # Example attribute for storing trouble messages
             cls._section_bullet = "\n\u27a4"
             cls._bullet = "\u2726"
             cls._new_lines = "\n"
-            cls._header_stack = []
+            cls._instance._max_records = cls.MAX_RECORDS
+            #Used where no run has called reset(), e.g. at startup
+            cls._instance._default_log = cls._TroubleLog(cls.MAX_RECORDS)
         return cls._instance
+
+    @property
+    def _log(self) -> '_TroubleLog':
+        return self._current_log.get(self._default_log)
+
+    def configure(self, max_records: int = MAX_RECORDS) -> None:
+        """Sets how many records are kept, the most recent records are kept if there are more"""
+        self._max_records = max(1, int(max_records))
+        log = self._log
+        with log.lock:
+            log.records = deque(log.records, maxlen=self._max_records)
+
+    @staticmethod
+    def submit(executor: Executor, fn: Callable, *args, **kwargs) -> Future:
+        """
+        Submits fn to an executor to run in a copy of the current context, so it logs to the caller's trouble log.
+        Worker processes can't share the context, so a ProcessPoolExecutor gets fn as is.
+        """
+        if isinstance(executor, ProcessPoolExecutor):
+            return executor.submit(fn, *args, **kwargs)
+        return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    @staticmethod
+    def bind(fn: Callable) -> Callable:
+        """
+        Returns a callable that runs fn in a copy of the current context, e.g. for a threading.Thread target or executor.map.
+        Each call gets its own copy as a context can only be entered by one thread at a time.
+        """
+        context = contextvars.copy_context()
+
+        def run_in_context(*args, **kwargs):
+            return context.copy().run(fn, *args, **kwargs)
+        return run_in_context
+
+    def _add(self, severity: Optional[Severity], message: str) -> None:
+        log = self._log
+        with log.lock:
+            if len(log.records) == log.records.maxlen and log.records[0].severity is not None:
+                log.dropped += 1
+            process_head = log.header_stack[-1] if log.header_stack else ""
+            log.records.append(self.Record(severity, message, process_head, time.time()))
     
     def set_process_header(self, process_head:str="New Process")-> None:
 
-        self._troubles += f'{self._new_lines}{self._section_bullet} Begin Log for: {process_head}:{self._new_lines}'
-        self._header_stack.append(process_head)
+        self._log.header_stack.append(process_head)
+        self._add(None, process_head)
 
     def pop_header(self)->bool:
         is_popped = False
-        if self._header_stack:
-            self._header_stack.pop()
-            if self._header_stack:
-                process_head = self._header_stack[-1]
-                self._troubles += f'{self._new_lines}{self._section_bullet} Begin Log for: {process_head}:{self._new_lines}'
+        header_stack = self._log.header_stack
+        if header_stack:
+            header_stack.pop()
+            if header_stack:
+                self._add(None, header_stack[-1])
                 is_popped = True
         
         return is_popped
@@ -61,36 +135,51 @@ class TroubleSgltn:
 
     def log_trouble(self, message: str, severity: Severity) -> None:
         """
-        Logs a trouble message with a specified severity, 
-        and formats it for display.
+        Logs a trouble message with a specified severity.
 
         Args:
             message (str): The trouble message to log.
             severity (str): The severity level of the message.
         """
-        # Example implementation; customize as needed
-        trouble_message = f"{self._bullet} {severity.name}: {message}{self._new_lines}"
-        self._troubles += trouble_message
+        self._add(severity, message)
 
     def reset(self, process_head:str='') -> None:
         """
-        Resets the stored trouble messages.
+        Starts a new, empty trouble log for the current context.
         Sets log name header if value is passed
         """
-        self._troubles = ""
-        self._header_stack = []
+        self._current_log.set(self._TroubleLog(self._max_records))
         if process_head:
             self.set_process_header(process_head)
 
 
-    def get_troubles(self) -> str:
+    def get_troubles(self, min_severity: Optional[Severity] = None) -> str:
         """
-        Returns the stored trouble messages.
+        Formats and returns the stored trouble messages of the current context.
+
+        Args:
+            min_severity (Severity): Optional, only messages of this severity or higher are included
 
         Returns:
             str: The accumulated trouble messages.
         """
-        return self._troubles if self._troubles else "No Troubles"
+        log = self._log
+        with log.lock:
+            records = list(log.records)
+            dropped = log.dropped
+        troubles = []
+        if dropped:
+            #The header of the first message kept was dropped with the earlier messages, so it's shown first
+            if records and records[0].severity is not None and records[0].process_head:
+                troubles.append(f'{self._new_lines}{self._section_bullet} Begin Log for: {records[0].process_head}:{self._new_lines}')
+            troubles.append(f"{self._bullet} WARNING: {dropped} earlier messages were dropped, "
+                            f"only the last {log.records.maxlen} are shown{self._new_lines}")
+        for record in records:
+            if record.severity is None:
+                troubles.append(f'{self._new_lines}{self._section_bullet} Begin Log for: {record.message}:{self._new_lines}')
+            elif min_severity is None or record.severity.value >= min_severity.value:
+                troubles.append(f"{self._bullet} {record.severity.name}: {record.message}{self._new_lines}")
+        return "".join(troubles) if troubles else "No Troubles"
 
 
 class helpSgltn:
@@ -109,8 +198,11 @@ class helpSgltn:
         help_file = j_mmgr.append_filename_to_path(j_mmgr.script_dir, 'help.json')
         help_data = j_mmgr.load_json(help_file, False)
         self._style_prompt_help = ""
+        self._batch_style_prompt_help = ""
         self._dalle_help = ''
         self._exif_wrangler_help = ''
+        self._batch_exif_wrangler_help = ''
+        self._metadata_search_help = ''
         # Empty help text is not a critical issue for the app
         if not help_data:
             j_mmgr.log_e('Help data file is empty or missing.',
@@ -118,22 +210,379 @@ class helpSgltn:
             return
         #Get help text
         self._style_prompt_help = help_data.get('sp_help','')
+        self._batch_style_prompt_help = help_data.get('batch_sp_help','')
         self._exif_wrangler_help = help_data.get('wrangler_help', '')
+        self._batch_exif_wrangler_help = help_data.get('batch_wrangler_help', '')
+        self._metadata_search_help = help_data.get('search_help', '')
         self._dalle_help = help_data.get('dalle_help', '')
 
     @property
     def style_prompt_help(self)->str:
         return self._style_prompt_help
     
+    @property
+    def batch_style_prompt_help(self)->str:
+        return self._batch_style_prompt_help
+    
     @property
     def exif_wrangler_help(self)->str:
         return self._exif_wrangler_help
     
+    @property
+    def batch_exif_wrangler_help(self)->str:
+        return self._batch_exif_wrangler_help
+    
+    @property
+    def metadata_search_help(self)->str:
+        return self._metadata_search_help
+    
     @property
     def dalle_help(self)->str:
         return self._dalle_help
     
 
+class PromptFilter:
+    """
+    Decides which strings qualify as Possible Prompts: at least min_prompt_len long once stripped, at least
+    alpha_pct of the characters alphabetical, whitespace or commas, and containing filter_phrase (case-insensitive).
+    The character count uses str.translate for ASCII text, and each distinct string is only scored once.
+    """
+    @staticmethod
+    def is_prompt_char(c: str) -> bool:
+        return c.isalpha() or c.isspace() or c == ','
+
+    #Deletes every ASCII prompt char, built from is_prompt_char so both paths count the same chars
+    _ASCII_PROMPT_CHARS = {i: None for i in range(128) if chr(i).isalpha() or chr(i).isspace() or chr(i) == ','}
+
+    def __init__(self, min_prompt_len: int = 1, alpha_pct: float = 0.0, filter_phrase: str = ""):
+        self.min_prompt_len = min_prompt_len
+        self.alpha_pct = alpha_pct
+        self.filter_phrase_lower = filter_phrase.lower()
+        self._verdicts = {}
+
+    def prompt_char_ratio(self, s: str) -> float:
+        """Calculate the ratio of common prompt chars: alphabetical characters, spaces and commas to the string's total length."""
+        if not s:
+            return 0
+        rest = s.translate(self._ASCII_PROMPT_CHARS)
+        count = len(s) - len(rest)
+        if not rest.isascii():
+            #The ASCII chars left aren't prompt chars, so only the non-ASCII ones are counted
+            count += sum(self.is_prompt_char(c) for c in rest)
+        return count / len(s)
+
+    def accepts(self, s: str) -> bool:
+        verdict = self._verdicts.get(s)
+        if verdict is None:
+            #Cheapest checks first, strip() can only make the string shorter
+            verdict = (len(s) >= self.min_prompt_len
+                       and len(s.strip()) >= self.min_prompt_len
+                       and (not self.filter_phrase_lower or self.filter_phrase_lower in s.lower())
+                       and self.prompt_char_ratio(s) >= self.alpha_pct)
+            self._verdicts[s] = verdict
+        return verdict
+
+    def filter(self, items: list) -> list:
+        """
+        Filters a list of potential prompts, including those in nested lists.  Non-string items are dropped, as are
+        nested lists left empty.
+        """
+        filtered_items = []
+        stack = [(iter(items), filtered_items)]
+        while stack:
+            iterator, out = stack[-1]
+            for item in iterator:
+                if isinstance(item, str):
+                    if self.accepts(item):
+                        out.append(item)
+                elif isinstance(item, list):
+                    stack.append((iter(item), []))
+                    break
+            else:
+                stack.pop()
+                if stack and out:
+                    stack[-1][1].append(out)
+        return filtered_items
+
+
+class EventLogWriter:
+    """
+    A Singleton that writes the event logs from a background thread, so logging doesn't add file I/O to node runs.
+    json_manager.log_events() queues each event and returns.  The writer thread formats the queued events, keeps the
+    log files open, writes the events in batches and flushes them every FLUSH_INTERVAL seconds and at exit.
+    Events below the minimum severity aren't written.  It's set with the PLUSH_LOG_SEVERITY environment variable or the
+    'log_min_severity' key in config.json (INFO, WARNING or ERROR), which are read once at startup.
+    A log file that reaches 'log_max_mb' or holds more than 'log_segment_days' of events is rotated into a gzipped
+    segment, e.g. Plush-Events.20240301-101500.log.gz, named for its first event.  Old logs are pruned by deleting
+    whole segments, so no log entries are parsed.
+    """
+    _instance = None
+
+    FLUSH_INTERVAL = 1.0
+    TIMESTAMP_FORMAT = "%Y-%m-%d %I:%M:%S %p" #YYYY/MM/DD, 12 hour AM/PM
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._read_settings()
+            cls._instance._start_lock = threading.Lock()
+            cls._instance._reset()
+        return cls._instance
+
+
+    def _reset(self) -> None:
+        #Also used in a forked child, which gets a copy of the parent's writer but not its thread
+        self._pid = os.getpid()
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+
+    def _read_settings(self) -> None:
+        #No logging in here, the writer is what would log it
+        try:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json'), 'r', encoding='utf-8') as file:
+                config_data = json.load(file)
+            if not isinstance(config_data, dict):
+                config_data = {}
+        except (OSError, ValueError):
+            config_data = {}
+        name = os.getenv('PLUSH_LOG_SEVERITY', "") or config_data.get('log_min_severity', "")
+        self.min_severity = TroubleSgltn.Severity.__members__.get(str(name).strip().upper(), TroubleSgltn.Severity.INFO)
+        try:
+            self.max_bytes = int(float(config_data.get('log_max_mb', 10)) * 1024 * 1024)
+            self.segment_seconds = float(config_data.get('log_segment_days', 1)) * 86400
+        except (TypeError, ValueError):
+            self.max_bytes = 10 * 1024 * 1024
+            self.segment_seconds = 86400.0
+
+
+    def _start(self) -> bool:
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    thread = threading.Thread(target=self._run, name="Plush-EventLogWriter", daemon=True)
+                    try:
+                        thread.start()
+                    except RuntimeError:
+                        #No new threads during interpreter shutdown
+                        return False
+                    self._thread = thread
+                    #Worker processes exit without running atexit, multiprocessing's finalizers do run
+                    atexit.register(self.shutdown)
+                    multiprocessing.util.Finalize(self, self.shutdown, exitpriority=10)
+        return True
+
+
+    def write(self, file_path: str, timestamp: datetime, severity: TroubleSgltn.Severity, event: str) -> None:
+        """
+        Queues an event to be appended to a log file.
+
+        Args:
+            file_path (str): The log file
+            timestamp (datetime): When the event happened
+            severity (TroubleSgltn.Severity): The event's severity
+            event (str): The event information
+        """
+        if severity.value < self.min_severity.value:
+            return
+        if self._start():
+            self._queue.put(('event', file_path, (timestamp, severity.name, event)))
+        else:
+            self._append(file_path, self._format(timestamp, severity.name, event))
+
+
+    def _send(self, command: str, file_path: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        #Queues a command behind the events already queued and waits for the writer to carry it out
+        thread = self._thread
+        if thread is None or self._pid != os.getpid() or not thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put((command, file_path, done))
+        return done.wait(timeout)
+
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Writes every event queued so far to its log file.  Returns False if the timeout ran out first."""
+        return self._send('flush', timeout=timeout)
+
+
+    def close(self, file_path: Union[str, Path]) -> bool:
+        """Writes the queued events, then closes the log file so it can be pruned, replaced or deleted."""
+        return self._send('close', str(file_path))
+
+
+    def prune(self, file_path: Union[str, Path], max_age_days: float) -> None:
+        """
+        Queues the deletion of a log file's segments that haven't been written to in max_age_days.
+        It doesn't wait, the writer thread deletes them and logs how many were removed.
+        """
+        if self._start():
+            self._queue.put(('prune', str(file_path), max_age_days))
+        else:
+            self._prune(str(file_path), max_age_days)
+
+
+    @staticmethod
+    def segment_pattern(file_path: str) -> str:
+        #Matches the segments of a log file, but not the log file itself
+        stem, ext = os.path.splitext(os.path.basename(file_path))
+        return f"{stem}.*{ext}*"
+
+
+    def shutdown(self) -> None:
+        """Writes the queued events and stops the writer thread.  The next write starts it again."""
+        if self._send('stop', timeout=5):
+            self._thread = None
+
+
+    def _format(self, timestamp: datetime, severity_name: str, event: str) -> str:
+        #json.dumps handles invalid chars in the event
+        return json.dumps({"timestamp": timestamp.strftime(self.TIMESTAMP_FORMAT),
+                           "severity": severity_name,
+                           "event": event}) + '\n'
+
+
+    @staticmethod
+    def _append(file_path: str, data: str) -> bool:
+        try:
+            with open(file_path, 'a', encoding='utf-8') as file:
+                file.write(data)
+            return True
+        except (IOError, OSError):
+            return False
+
+
+    def _run(self) -> None:
+        files = {}
+        segment_starts = {}
+        pending = {}
+        last_flush = time.monotonic()
+
+        def close_file(path):
+            file = files.pop(path, None)
+            segment_starts.pop(path, None)
+            if file is not None:
+                try:
+                    file.close()
+                except (IOError, OSError):
+                    pass
+
+        def open_file(path):
+            file = files.get(path)
+            if file is None:
+                file = files[path] = open(path, 'a', encoding='utf-8')
+                segment_starts[path] = self._segment_start(path)
+            return file
+
+        def write_pending():
+            #One write and flush per file, so nothing is left in a file buffer for a forked process to inherit
+            for path, lines in pending.items():
+                data = ''.join(lines)
+                try:
+                    file = open_file(path)
+                    size = file.tell()
+                    if size and (size + len(data) > self.max_bytes or time.time() - segment_starts[path] > self.segment_seconds):
+                        start = segment_starts[path]
+                        close_file(path)
+                        self._rotate(path, start)
+                        file = open_file(path)
+                    file.write(data)
+                    file.flush()
+                except (IOError, OSError):
+                    #Logging can't log its own errors, these events are dropped
+                    close_file(path)
+            pending.clear()
+
+        while True:
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=self.FLUSH_INTERVAL))
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            for command, path, payload in batch:
+                if command == 'event':
+                    pending.setdefault(path, []).append(self._format(*payload))
+                    continue
+                write_pending()
+                last_flush = time.monotonic()
+                if command == 'prune':
+                    self._prune(path, payload)
+                    continue
+                if command == 'close':
+                    close_file(path)
+                elif command == 'stop':
+                    for open_path in list(files):
+                        close_file(open_path)
+                    payload.set()
+                    return
+                payload.set()
+
+            if pending and time.monotonic() - last_flush >= self.FLUSH_INTERVAL:
+                write_pending()
+                last_flush = time.monotonic()
+
+
+    def _segment_start(self, path: str) -> float:
+        #When a log file's first event was written, only its first line is read
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                first_line = file.readline()
+            if first_line.strip():
+                return datetime.strptime(json.loads(first_line)["timestamp"], self.TIMESTAMP_FORMAT).timestamp()
+        except (OSError, ValueError, KeyError, TypeError):
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                pass
+        return time.time()
+
+
+    def _rotate(self, path: str, start: float) -> None:
+        """
+        Moves a log file to a segment named for its first event, then compresses the segment.  The rename is done
+        first so new events go to a new log file, if the compression fails the uncompressed segment is kept.
+        """
+        stem, ext = os.path.splitext(path)
+        base = f"{stem}.{datetime.fromtimestamp(start).strftime('%Y%m%d-%H%M%S')}"
+        segment = f"{base}{ext}"
+        count = 0
+        while os.path.exists(segment) or os.path.exists(segment + '.gz'):
+            count += 1
+            segment = f"{base}-{count}{ext}"
+        os.replace(path, segment)
+        temp_path = segment + '.gz.tmp'
+        try:
+            with open(segment, 'rb') as source, gzip.open(temp_path, 'wb') as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            # Pruning goes by mtime, so the segment keeps the time of its last event rather than the rotation time
+            shutil.copystat(segment, temp_path)
+            os.replace(temp_path, segment + '.gz')
+            os.remove(segment)
+        except (IOError, OSError):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+    def _prune(self, path: str, max_age_days: float) -> None:
+        cutoff = time.time() - max_age_days * 86400
+        removed = 0
+        for segment in Path(path).parent.glob(self.segment_pattern(path)):
+            try:
+                if segment.stat().st_mtime < cutoff:
+                    segment.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            self.write(path, datetime.now(), TroubleSgltn.Severity.INFO,
+                       f'{removed} old log segments were removed for the log file: {os.path.basename(path)}')
+
+
 class json_manager:
 
     def __init__(self):
@@ -153,6 +602,7 @@ class json_manager:
         self.customnodes_dir = self.find_child_directory(self.comfy_dir, 'custom_nodes', False, True)
         self.temp_dir = self.find_child_directory(self.script_dir, 'temp', True)
         self.log_dir = self.find_child_directory(self.script_dir, 'logs', True)
+        self.cache_dir = self.find_child_directory(self.script_dir, 'cache', True)
         self.log_file_name = "Plush-Events"
         #Private Properties
         self._config_bad = os.path.join(self.script_dir, 'config.bad')
@@ -165,12 +615,15 @@ class json_manager:
         Appends events with prepended timestamp to a text log file.
         Each event is written in a key/value pair format.
         Creates the file if it doesn't exist. Also, prints to console if specified.
+        The event is queued for EventLogWriter's background thread, unless is_critical is set, then it's
+        written before this method returns.
 
         Args:
             event (str): The event information.
             severity (TroubleSgltn.Severity): An Enum indicating the severity of the issue
             file_name (str): The name of the log file. Defaults to self.log_file_name if None.
             is_trouble (bool): Whether to log the event in TroubleSgltn to be presented to the user
+            is_critical (bool): If True the event is written immediately and write errors are raised
         Returns:
             bool: True if successful, False otherwise.
         """
@@ -180,8 +633,17 @@ class json_manager:
         if is_trouble:
             self.trbl.log_trouble(event, severity)
 
+        log_file_path = os.path.join(self.log_dir, f"{file_name}.log")
+
+        writer = EventLogWriter()
+        if isinstance(event, str) and not is_critical:
+            writer.write(log_file_path, datetime.now(), severity, event)
+            return True
+
+        if severity.value < writer.min_severity.value:
+            return True
         date_time = datetime.now()
-        timestamp = date_time.strftime("%Y-%m-%d %I:%M:%S %p") #YYYY/MM/DD, 12 hour AM/PM
+        timestamp = date_time.strftime(EventLogWriter.TIMESTAMP_FORMAT)
 
        #Create a dict of the log event
         log_event_data = {
@@ -194,9 +656,8 @@ class json_manager:
         if log_event_json is None:
             return False
 
-        log_file_path = self.append_filename_to_path(self.log_dir, f"{file_name}.log", True)
-
-        # Use the append_to_file utility to write the log event to the file
+        # Events queued before this one are written first
+        writer.flush()
         success = self.append_to_file(log_event_json, log_file_path, is_critical, is_logger=True)
 
         return success
@@ -330,40 +791,6 @@ class json_manager:
         return all_deletions_successful
     
    
-    def remove_log_entries_by_age(self, log_file_path, days_allowed):
-        timestamp_format = "%Y-%m-%d %I:%M:%S %p"
-        cutoff_time = datetime.now() - timedelta(days=days_allowed)
-        deleted_count = 0
-        updated_entries = []
-        try:
-            with open(log_file_path, "r", encoding='utf-8') as file:
-                for line in file:
-                    # Skip empty lines
-                    if not line.strip():
-                        continue
-                    log_entry = json.loads(line)
-                    entry_time = datetime.strptime(log_entry["timestamp"], timestamp_format)
-                    if entry_time > cutoff_time:
-                        updated_entries.append(json.dumps(log_entry))
-                    else:
-                        deleted_count += 1
-        except Exception as e:
-            self.log_events(f"Error reading log file: {log_file_path}: {e}",
-                            TroubleSgltn.Severity.WARNING,
-                            True)
-            return None
-        
-        # Use write_string_to_file to write updated entries back
-        updated_content = "\n".join(updated_entries) + '\n'
-        success = self.write_string_to_file(updated_content, log_file_path)
-        if not success:
-            self.log_events(f"Failed to write updated log entries back to file: {log_file_path}",
-                            TroubleSgltn.Severity.ERROR,
-                            True)
-            return None
-        return(deleted_count)
-
-    
     def generate_unique_filename(self, extension: str, base: str="")->str:
         """
         Generates a unique file name by incorporating Date and Time
@@ -552,9 +979,10 @@ class json_manager:
     
     def extract_from_dict(self, dict_data:dict, target:list)->dict:
         """
-        A recursive method that extracts data from a dict by finding keys that meet the criteria in the target argument, and 
+        Extracts data from a dict by finding keys that meet the criteria in the target argument, and 
         returns them and their values in a new dict.  Duplicate keys have their values stored in a list under the key.  
-        JSON strings are coerced to a dictionary object.
+        JSON strings are coerced to a dictionary object.  The data is walked once for all the target keys, with an
+        explicit stack so deep nesting can't hit the recursion limit, and each JSON string is parsed once.
             Args:
                 dict_data (dict):  The dictionary to be searched for matching values
                 target (list):  A list of search values 
@@ -563,51 +991,70 @@ class json_manager:
                 A dictionary containg the dicts whose keys match the criteria and lists that either hold values from 
                 duplicate keys, or had elements that matched the criteria
         """
-
-        def find_it(data, search_key, new_dict):
-                    
-                    for k, v in data.items():
-                        if k == search_key:
-
-                            if k in new_dict: #key is a duplicate
-                                if isinstance(new_dict[k], list): #if the new item is a list
-                                    new_dict[k].append(v)#append the list with the dupe key
-                                else:
-                                    new_dict[k] = [new_dict[k], v] #Convert it to a list and append it
-                            else:
-                                new_dict[k] = v                            
-                        
-                        elif isinstance(v, str):
-                            v = v.strip()
-                            if v.startswith('{') or v.startswith('['):
-                                try:
-                                    parsed = json.loads(v)
-                                    find_it(parsed, search_key, new_dict) 
-                                except json.JSONDecodeError:
-                                    #Whoops it's not a JSON string
-                                    self.log_events(f"Attempt to convert string to dictionary failed, some data will be missing:  {v}",
-                                                    TroubleSgltn.Severity.WARNING,
-                                                    True)
-                                    continue
-                        elif isinstance(v, dict):
-                             find_it(v, search_key, new_dict)
-                        elif isinstance(v, list):                            
-                            for i in v:                                
-                                if i == search_key:                                  
-                                    new_dict[k] = v
-                                if isinstance(i, dict):
-                                     find_it(i, search_key, new_dict)
-              
         new_dict = {}
-        local_source = dict_data
 
-        if isinstance(target, list):
-            for search_key in target:
-                find_it(local_source, search_key, new_dict)
-        else:
+        if not isinstance(target, list):
             self.log_events(f"'extract_from_dict', Incoming search terms were not a list object. Return empty dict.",
                             TroubleSgltn.Severity.WARNING,
                             True)
+            return new_dict
+
+        search_keys = tuple(dict.fromkeys(target))
+        #The matches for each search key in the order a separate search for that key finds them:
+        #(True, key, value) for a matching key, (False, key, list) for a list that contains the search key
+        found = {search_key: [] for search_key in search_keys}
+
+        #Stack entries: (iterator, parent key, parent list, search keys still wanted).  The parent list is None
+        #when the iterator is over a dict's items.  Once a key matches, it isn't searched for inside its own value
+        end = object()
+        stack = [(iter(dict_data.items()), None, None, search_keys)]
+        while stack:
+            items, list_key, parent_list, wanted = stack[-1]
+            item = next(items, end)
+            if item is end:
+                stack.pop()
+                continue
+
+            if parent_list is not None:
+                for search_key in wanted:
+                    if item == search_key:
+                        found[search_key].append((False, list_key, parent_list))
+                if isinstance(item, dict):
+                    stack.append((iter(item.items()), None, None, wanted))
+                continue
+
+            k, v = item
+            if k in wanted:
+                found[k].append((True, k, v))
+                wanted = tuple(search_key for search_key in wanted if search_key != k)
+                if not wanted:
+                    continue
+
+            if isinstance(v, str):
+                v = v.strip()
+                if v.startswith('{') or v.startswith('['):
+                    try:
+                        v = json.loads(v)
+                    except json.JSONDecodeError:
+                        #Whoops it's not a JSON string
+                        self.log_events(f"Attempt to convert string to dictionary failed, some data will be missing:  {v}",
+                                        TroubleSgltn.Severity.WARNING,
+                                        True)
+                        continue
+            if isinstance(v, dict):
+                stack.append((iter(v.items()), None, None, wanted))
+            elif isinstance(v, list):
+                stack.append((iter(v), k, v, wanted))
+
+        #Merge the matches in target order.  Lists are copied before values are appended to them so the source data isn't changed
+        for search_key in target:
+            for is_key, key, value in found[search_key]:
+                if is_key and key in new_dict:  #key is a duplicate
+                    if not isinstance(new_dict[key], list):
+                        new_dict[key] = [new_dict[key]]
+                    new_dict[key].append(value)
+                else:
+                    new_dict[key] = list(value) if isinstance(value, list) else value
         return new_dict
     
 
@@ -615,11 +1062,12 @@ class json_manager:
 
     def extract_with_translation(self, dict_data: dict, translate_keys: dict, min_prompt_len:int=1, alpha_pct:float=0.0, filter_phrase:str ="") -> dict:
         """
-        A recursive method that extracts and translates keys from a dict by finding keys that match those in the 
+        Extracts and translates keys from a dict by finding keys that match those in the 
         translate_keys argument, and returns them with their values in a new dict using the friendly names. 
         Duplicate keys have their values stored in a list under the friendly name key. JSON strings are coerced to 
         dictionary objects.  Possible Prompts have to meet the additional criteria of having a min length limit and
-        a max percent of numeric characters limit.
+        a max percent of numeric characters limit.  The data is walked iteratively, so deep nesting can't hit
+        the recursion limit, and dict_data isn't modified.
             Args:
                 dict_data (dict): The dictionary to be searched.
                 translate_keys (dict): A dictionary with original keys as keys and friendly names as values.
@@ -681,122 +1129,92 @@ class json_manager:
                 return value  # Return the original value if no match is found
 
         
-        def filter_prompt_items(items, min_prompt_len, alpha_pct, filter_phrase):
-            """Recursively filter potential prompts based on length and numeric character ratio criteria, including in nested lists."""
-            filtered_items = []
-            filter_phrase_lower = filter_phrase.lower()
-
-            def calculate_numeric_ratio(s: str) -> float:
-                """Calculate the ratio of numeric characters in a string to the string's total length."""
-                numeric_count = sum(c.isdigit() for c in s)
-                return numeric_count / len(s) if s else 0
-            
-            def calculate_prompt_char_ratio(s: str) -> float:
-                """Calculate the ratio of common prompt chars: alphabetical characters, spaces and commas to the string's total length."""
-                alpha_space_count = sum(c.isalpha() or c.isspace() or c== ',' for c in s)
-                return alpha_space_count / len(s) if s else 0
-
+        def translate_value(k, v):
+            friendly_name = translate_keys[k]  # Get the friendly name
+
+            # Special handling for 'Possible Prompt' and Exif info
+            if friendly_name == 'Possible Prompts':
+                if isinstance(v, list):
+                    v = prompt_filter.filter(v)
+                elif isinstance(v, str):
+                    v = v if prompt_filter.accepts(v) else None
+            elif "Exif" in k or "Xmp" in k:
+                # Apply division processing based on perform_math flag
+                if isinstance(v, str) and v.strip():
+                    v = process_and_divide(friendly_name, v)
+
+            #Append items if key is a duplicate, lists from the source data are copied before they're extended
+            if friendly_name in new_dict:  # Key is a duplicate
+                if isinstance(new_dict[friendly_name], list):
+                    new_dict[friendly_name].extend(v if isinstance(v, list) else [v])
+                else:
+                    new_dict[friendly_name] = [new_dict[friendly_name], v]
+            elif v:
+                new_dict[friendly_name] = list(v) if isinstance(v, list) else v
 
-            def filter_recursive(item):
-                if isinstance(item, str):
-                    if len(item.strip()) >= min_prompt_len and calculate_prompt_char_ratio(item) >= alpha_pct and filter_phrase_lower in item.lower():
-                        return item
-                elif isinstance(item, list):
-                    filtered_sublist = [filter_recursive(subitem) for subitem in item]
-                    filtered_sublist = [subitem for subitem in filtered_sublist if subitem is not None]  # Remove None values
-                    if filtered_sublist:
-                        return filtered_sublist
-                return None
 
-            for item in items:
-                result = filter_recursive(item)
-                if result is not None:
-                    filtered_items.append(result)
+        def parse_json(v):
+            #Each JSON string is parsed once, None if it isn't valid JSON
+            if v not in parsed_strings:
+                try:
+                    parsed_strings[v] = json.loads(v)
+                except json.JSONDecodeError:
+                    parsed_strings[v] = None
+                    self.log_events(f"JSON conversion failed: {v}", 
+                                    TroubleSgltn.Severity.WARNING,
+                                    True)
+            return parsed_strings[v]
 
-            return filtered_items
 
+        if not isinstance(dict_data, dict) or not isinstance(translate_keys, dict):
+            self.log_events("Improper data object passed to 'extract_with_translation', translation halted!",
+                            TroubleSgltn.Severity.ERROR,
+                            True)
+            return(new_dict) #Return an empty dict if passed objects are invalid
 
-        def find_and_translate(data, translate_dict,friendly_name):
+        # Walks the data with an explicit stack of (container type, iterator) so deeply nested workflows can't hit
+        # the recursion limit.  Dicts inside lists and tuples are searched, as are lists inside lists.
+        parsed_strings = {}
+        prompt_filter = PromptFilter(min_prompt_len, alpha_pct, filter_phrase)
+        end = object()
+        stack = [(dict, iter(dict_data.items()))]
+        while stack:
+            container, items = stack[-1]
+            item = next(items, end)
+            if item is end:
+                stack.pop()
+                continue
             try:
-                if isinstance(data, dict):
-                    for k, v in data.items():
-                        if k in translate_dict:  # Key matches one we're looking for
-                            friendly_name = translate_dict[k]  # Get the friendly name
-                            
-                            # Special handling for 'Possible Prompt' and Exif info
-                            if friendly_name == 'Possible Prompts':
-                                if isinstance(v, list):
-                                    v = filter_prompt_items(v, min_prompt_len, alpha_pct, filter_phrase)
-                                elif isinstance(v, str):
-                                    # Wrap the string in a list to use the same filtering logic
-                                    filtered_result = filter_prompt_items([v], min_prompt_len, alpha_pct, filter_phrase)
-                                    v = filtered_result[0] if filtered_result else None  # Unwrap if not empty
-                            elif "Exif" in k or "Xmp" in k:
-                                # Apply division processing based on perform_math flag
-                                if isinstance(v, str) and v.strip():
-                                    v = process_and_divide(friendly_name, v)
-
-                            #Append items if key is a duplicate
-                            if friendly_name in new_dict:  # Key is a duplicate   
-                                if isinstance(new_dict[friendly_name], list):
-                                    new_dict[friendly_name].extend(v if isinstance(v, list) else [v])
-                                else:
-                                    new_dict[friendly_name] = [new_dict[friendly_name], v] if isinstance(v, list) else [new_dict[friendly_name]] + [v]
-                            else:
-                                if v:
-                                    new_dict[friendly_name] = v
-
-                        elif isinstance(v, str) and v:  # Check for nested JSON strings
-                            if v.startswith('{') or v.startswith('['):
-                                try:
-                                    parsed = json.loads(v)
-                                    find_and_translate(parsed, translate_dict, friendly_name)
-                                except json.JSONDecodeError:
-                                    self.log_events(f"JSON conversion failed: {v}", 
-                                                    TroubleSgltn.Severity.WARNING,
-                                                    True)
-                        elif isinstance(v, dict) and v:  # Nested dict
-                            find_and_translate(v, translate_dict, friendly_name)
-                        elif isinstance(v, list) and v:  # List, could contain dicts
-                            for i in v:
-                                if isinstance(i, dict):
-                                    find_and_translate(i, translate_dict, friendly_name)
-                                elif isinstance(i,list):
-                                    find_and_translate(i, translate_dict,friendly_name)
-                        elif isinstance(v, tuple) and v:
-                            processed_elements = []
-                            for i in v:
-                                if isinstance(i, dict):
-                                    # Create a temporary dictionary to hold processed nested dictionaries
-                                    temp_dict = {}
-                                    find_and_translate(i, translate_dict, friendly_name)
-                                    processed_elements.append(temp_dict)
-                                elif k in translate_dict:
-                                    # Directly append simple values within the tuple
-                                    processed_elements.append(i)
-                            # Append the processed elements to new_dict under the corresponding friendly name
-                            # No need for a second check for k in translate_keys here
-                            if k in translate_dict:
-                                friendly_name = translate_dict[k]
-                                self.log_events(f"Found tuple: {friendly_name}: {processed_elements}",
-                                                is_trouble=True)
-                                new_dict[friendly_name] = tuple(processed_elements)
-                elif isinstance(data, list):
-                    for item in data:
-                        find_and_translate(item, translate_keys,friendly_name)  # Recursively handle items in lists
+                if container is not dict:
+                    if isinstance(item, dict):
+                        stack.append((dict, iter(item.items())))
+                    elif container is list and isinstance(item, list):
+                        stack.append((list, iter(item)))
+                    continue
+
+                k, v = item
+                if k in translate_keys:  # Key matches one we're looking for
+                    translate_value(k, v)
+                elif isinstance(v, str) and v:  # Check for nested JSON strings
+                    if v.startswith('{') or v.startswith('['):
+                        parsed = parse_json(v)
+                        if isinstance(parsed, dict):
+                            stack.append((dict, iter(parsed.items())))
+                        elif isinstance(parsed, list):
+                            stack.append((list, iter(parsed)))
+                elif isinstance(v, dict) and v:  # Nested dict
+                    stack.append((dict, iter(v.items())))
+                elif isinstance(v, list) and v:  # List, could contain dicts
+                    stack.append((list, iter(v)))
+                elif isinstance(v, tuple) and v:  # Only the dicts in a tuple are searched
+                    stack.append((tuple, iter(v)))
             except Exception as e:
+                #Skip the rest of the container that caused the error
                 self.log_events(f"An unexpected error occurred during data translation {str(e)}",
                                     TroubleSgltn.Severity.ERROR,
                                     True)
-                #End of find_and_translate
+                stack.pop()
 
-        if not isinstance(dict_data, dict) or not isinstance(translate_keys, dict):
-            self.log_events("Improper data object passed to 'extract_with_translation', translation halted!",
-                            TroubleSgltn.Severity.ERROR,
-                            True)
-            return(new_dict) #Return an empty dict if passed objects are invalid
-        friendly_name = ""
-        find_and_translate(dict_data, translate_keys,friendly_name)
         sorted_items = dict(sorted(new_dict.items(), key=custom_sort))
         return sorted_items
 
@@ -1152,17 +1570,9 @@ class json_manager:
             bool: True if an update is queued, represents a new version, and was successful
                 False otherwise.
         """
-                #pare down log file
+        #Prune old log segments in the background, the log file itself is rotated as it's written
         log_file = self.append_filename_to_path(self.log_dir,self.log_file_name + '.log')
-        num_removed = self.remove_log_entries_by_age(log_file, max_log_age)
-        if not num_removed == None:
-            self.log_events(f'{num_removed} old entries were removed from the log file: {self.log_file_name}')
-        else:
-            if os.path.exists(log_file):
-                    os.remove(log_file)
-            self.log_events(f'Log file {self.log_file_name} was unable to be processed for old entries.  File was corrupt and was deleted',
-                            TroubleSgltn.Severity.ERROR)
-            
+        EventLogWriter().prune(log_file, max_log_age)
 
         # Check for config.json
         if not os.path.exists(self.config_file):
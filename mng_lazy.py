@@ -0,0 +1,40 @@
+
+import importlib
+import threading
+import time
+from .mng_json import json_manager, TroubleSgltn
+
+
+class LazyModule:
+    """
+    Stands in for a module that's slow to import, e.g. torch or openai, so loading the node pack doesn't import it.
+    The module is imported the first time one of its attributes is used, after that attributes come straight
+    from the module.  Use it as a module level name:  np = LazyModule('numpy')
+    The LazyModule's own attributes are name mangled so they can't hide the module's, e.g. numpy.load.
+    """
+    def __init__(self, name: str):
+        self.__name = name
+        self.__module = None
+        self.__lock = threading.Lock()
+
+    def __load(self):
+        #Returns the module, importing it on first use
+        module = self.__module
+        if module is None:
+            with self.__lock:
+                if self.__module is None:
+                    start_time = time.perf_counter()
+                    self.__module = importlib.import_module(self.__name)
+                    json_manager().log_events(f"Plush - Loaded {self.__name} on first use in {(time.perf_counter() - start_time) * 1000:.0f}ms",
+                                              TroubleSgltn.Severity.INFO)
+                module = self.__module
+        return module
+
+    def __getattr__(self, attr: str):
+        #Only called for names that aren't set on the LazyModule itself
+        if attr.startswith('_LazyModule__'):
+            raise AttributeError(attr)
+        return getattr(self.__load(), attr)
+
+    def __repr__(self) -> str:
+        return f"<LazyModule '{self.__name}' ({'loaded' if self.__module is not None else 'not loaded'})>"
@@ -0,0 +1,254 @@
+
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Any, Callable
+from .mng_json import json_manager, TroubleSgltn
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket rate limiter.  The bucket refills continuously at rate_per_minute
+    and holds at most 'capacity' tokens, so short bursts are allowed up to the capacity.  A request
+    larger than the capacity is charged in full and leaves the bucket in debt, which later requests
+    wait off, so the long run average stays at the rate.  A rate of 0 or less disables limiting.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = 0):
+        """
+        Args:
+            rate_per_minute (float): Tokens added to the bucket per minute
+            capacity (float): Maximum tokens in the bucket, defaults to one second's worth of tokens (min 1)
+        """
+        self.rate_per_sec = rate_per_minute / 60.0 if rate_per_minute > 0 else 0
+        self.capacity = capacity if capacity > 0 else max(1.0, self.rate_per_sec)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate_per_sec)
+        self._last = now
+
+
+    def acquire(self, amount: float = 1) -> float:
+        """
+        Blocks until 'amount' tokens are available and removes them from the bucket.
+        Requests larger than the capacity go ahead once the bucket is full and take the bucket
+        below zero, so the tokens they're over by are paid back before the next request.
+
+        Args:
+            amount (float): The number of tokens to take
+
+        Returns:
+            float: The number of seconds spent waiting
+        """
+        if not self.rate_per_sec:
+            return 0.0
+        #A request larger than the bucket can hold only waits for a full bucket
+        needed = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return waited
+                wait = (needed - self._tokens) / self.rate_per_sec
+            time.sleep(wait)
+            waited += wait
+
+
+class RequestScheduler:
+    """
+    A Singleton that every Plush node sends its API requests through.  It retries transient
+    failures (rate limits, timeouts, connection errors and server errors) with jittered exponential
+    backoff, honouring the Retry-After and x-ratelimit-reset headers, within a total deadline.
+    It also keeps an adaptive concurrency window shared by the whole process:  the window grows by
+    one slot per window of successful requests and halves on a rate limit response, at which point
+    all requests also pause until the server's reset time.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._cond = threading.Condition()
+            cls._instance._in_flight = 0
+            cls._instance._paused_until = 0.0
+            cls._instance.configure()
+        return cls._instance
+
+
+    def configure(self, max_concurrency: int = 8, max_retries: int = 5, deadline: float = 120.0,
+                  base_delay: float = 1.0, max_delay: float = 60.0) -> None:
+        """
+        Args:
+            max_concurrency (int): The most requests allowed in flight at once across all nodes
+            max_retries (int): The most times a single request is retried
+            deadline (float): Total seconds a request, including retries and waits, may take
+            base_delay (float): The backoff delay before the first retry
+            max_delay (float): The largest backoff delay between retries
+        """
+        with self._cond:
+            self.max_concurrency = max(1, max_concurrency)
+            self.max_retries = max(0, max_retries)
+            self.deadline = deadline
+            self.base_delay = base_delay
+            self.max_delay = max_delay
+            self._window = float(self.max_concurrency)
+            self._cond.notify_all()
+
+
+    @property
+    def window(self) -> int:
+        return max(1, int(self._window))
+
+
+    @staticmethod
+    def parse_duration(value: str) -> Optional[float]:
+        """
+        Parses the duration formats OpenAI uses in its rate limit headers, e.g. '20ms', '1s', '6m0s', '1h2m3.5s'
+        as well as plain seconds.
+
+        Returns:
+            float: Seconds, or None if the value can't be parsed
+        """
+        if not value:
+            return None
+        value = value.strip()
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        parts = re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', value)
+        if not parts or ''.join(num + unit for num, unit in parts) != value:
+            return None
+        scale = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+        return sum(float(num) * scale[unit] for num, unit in parts)
+
+
+    @classmethod
+    def retry_after(cls, error: Exception) -> Optional[float]:
+        """
+        Reads how long the server asked us to wait from an API error's response headers.
+
+        Returns:
+            float: Seconds to wait, or None if the server didn't say
+        """
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            return None
+
+        retry_ms = headers.get('retry-after-ms')
+        if retry_ms:
+            try:
+                return float(retry_ms) / 1000
+            except ValueError:
+                pass
+
+        retry_after = headers.get('retry-after')
+        if retry_after:
+            seconds = cls.parse_duration(retry_after)
+            if seconds is None:
+                try:
+                    seconds = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    seconds = None
+            if seconds is not None:
+                return max(0.0, seconds)
+
+        #The reset time of whichever limit ran out
+        resets = []
+        for kind in ('requests', 'tokens'):
+            remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+            reset = cls.parse_duration(headers.get(f'x-ratelimit-reset-{kind}', ''))
+            if reset is not None and (remaining is None or remaining.strip() == '0'):
+                resets.append(reset)
+        return max(resets) if resets else None
+
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """
+        Transient errors are worth retrying, errors in the request itself or an exhausted quota are not.
+        """
+        if getattr(error, 'code', None) == 'insufficient_quota':
+            return False
+        status = getattr(error, 'status_code', None)
+        if status is not None:
+            return status in (408, 409, 429) or status >= 500
+        return type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+    def _acquire(self, deadline_time: float) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if now >= deadline_time:
+                    raise TimeoutError("Plush request scheduler: deadline passed while waiting for a request slot")
+                wait = self._paused_until - now
+                if wait <= 0 and self._in_flight < self.window:
+                    self._in_flight += 1
+                    return
+                self._cond.wait(timeout=min(deadline_time - now, wait if wait > 0 else 1.0))
+
+
+    def _release(self, success: bool, rate_limited: bool = False, pause: float = 0.0) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if success:
+                self._window = min(float(self.max_concurrency), self._window + 1.0 / self._window)
+            elif rate_limited:
+                self._window = max(1.0, self._window / 2)
+                if pause > 0:
+                    self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._cond.notify_all()
+
+
+    def call(self, func: Callable, *args, description: str = "API request", **kwargs) -> Any:
+        """
+        Runs func(*args, **kwargs) inside the shared concurrency window, retrying transient errors.
+        The last error is raised when the retries or the deadline run out, or when an error isn't retryable.
+
+        Args:
+            func (Callable): The API call, e.g. client.chat.completions.create
+            description (str): Names the request in log messages
+
+        Returns:
+            Whatever func returns
+        """
+        j_mngr = json_manager()
+        deadline_time = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            self._acquire(deadline_time)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                retryable = self.is_retryable(e)
+                server_wait = self.retry_after(e) if retryable else None
+                rate_limited = getattr(e, 'status_code', None) == 429
+                self._release(False, rate_limited, server_wait or 0.0)
+
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                backoff = min(self.max_delay, self.base_delay * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                delay = max(backoff, server_wait or 0.0)
+                if time.monotonic() + delay >= deadline_time:
+                    raise
+                attempt += 1
+                j_mngr.log_events(f"{description} failed with: {type(e).__name__}, retry {attempt} of {self.max_retries} in {delay:.1f}s",
+                                  TroubleSgltn.Severity.WARNING,
+                                  True)
+                time.sleep(delay)
+                continue
+
+            self._release(True)
+            return result
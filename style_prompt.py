@@ -1,20 +1,34 @@
-
-import openai
-from openai import OpenAI
+from __future__ import annotations
 import os
 import base64
 from io import BytesIO
-from PIL import Image, ImageOps, TiffImagePlugin, UnidentifiedImageError
-from PIL.ExifTags import TAGS
 import folder_paths
-import numpy as np
+import comfy.utils
 import time
 import re
-import torch
-from typing import Optional, Any,  Union
+import math
+import warnings
+from typing import Optional, Any,  Union, Callable
 from enum import Enum
-import requests
+import json
+import csv
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from .mng_json import json_manager, helpSgltn, TroubleSgltn
+from .mng_cache import ResponseCache, CacheMode, ImageArtifactCache, LRUCache
+from .mng_sched import TokenBucket, RequestScheduler
+from .mng_exif import read_file_bytes, read_image_info, build_meta_data, translate_meta_data, extract_files, flatten_value, FRIENDLY_NAMES
+from .mng_index import MetadataIndex
+from .mng_lazy import LazyModule
+
+#The heavy libraries are imported when a node first uses them, so loading the nodes stays fast
+openai = LazyModule('openai')
+httpx = LazyModule('httpx')
+np = LazyModule('numpy')
+torch = LazyModule('torch')
+Image = LazyModule('PIL.Image')
+ImageOps = LazyModule('PIL.ImageOps')
 
 
 #pip install pillow
@@ -47,15 +61,12 @@ class cFigSingleton:
         # Errors will be raised since is_critical is set to True
         config_data = j_mngr.load_json(j_mngr.config_file, True)
 
-        #Pyexiv2 seems to have trouble loading with some Python versions (it's misreading the vesrion number)
-        #So I'll open it in a try block so as not to stop the whole suite from loading
-        try:
-            import pyexiv2
-            self._pyexiv2 = pyexiv2
-        except Exception as e:
-            self._pyexiv2 = None
-            j_mngr.log_events(f"The Pyexiv2 library failed to load with Error: {e} ",
-                              TroubleSgltn.Severity.ERROR)
+        #pyexiv2 and the OpenAI client are loaded on first use, see the pyexiv2 and openaiClient properties
+        self._pyexiv2 = None
+        self._pyexiv2_loaded = False
+        self.figOAIClient = None
+        self._client_created = False
+        self._load_lock = threading.Lock()
 
         #check if file is empty
         if not config_data:
@@ -85,17 +96,32 @@ class cFigSingleton:
         self.fig_n_ImgPromptInstruction = config_data.get('n_img_prompt_instruction', "")
         self.fig_n_ImgInstruction = config_data.get('n_img_instruction', "")
         
+        #Transport settings shared by every OpenAI request, text and vision.
+        #base_url lets the nodes talk to a local mock or proxy server
+        self.figBaseUrl = config_data.get('base_url', "") or os.getenv('OPENAI_BASE_URL', "")
+        self.figPoolSize = config_data.get('http_pool_size', 10)
+        self.figTimeout = config_data.get('http_timeout', 120.0)
+
+        #Response cache limits
+        self.figCacheTTL = config_data.get('cache_ttl_hours', 168) * 3600
+        self.figCacheMaxEntries = config_data.get('cache_max_entries', 256)
+        self.figCacheMaxDiskEntries = config_data.get('cache_max_disk_entries', 2048)
+        self.figImageCacheMaxBytes = int(config_data.get('image_cache_max_mb', 2048) * 1024**2)
+        #Retry and concurrency limits shared by every Plush API request
+        RequestScheduler().configure(max_concurrency=config_data.get('max_concurrent_requests', 8),
+                                     max_retries=config_data.get('max_retries', 5),
+                                     deadline=config_data.get('retry_deadline', 180.0))
+
+        #How many trouble messages a run keeps for its troubleshooting output
+        TroubleSgltn().configure(max_records=config_data.get('trouble_max_records', TroubleSgltn.MAX_RECORDS))
+
+        #Fetch the style backgrounder for every style in the background once style_info is first used
+        self.figStyleInfoPrewarm = config_data.get('style_info_prewarm', False)
+
         #Exif
         # Help output text
         #self.fig_sp_help = config_data.get('sp_help', "")
 
-        if self._figKey:
-            try:
-                self.figOAIClient = OpenAI(api_key= self._figKey)
-            except Exception as e:
-                j_mngr.log_events("Invalid or missing OpenAI API key.  Please note, keys must now be kept in an environment variable (see: ReadMe)",
-                                  severity=TroubleSgltn.Severity.ERROR)
-
 
 
     @property
@@ -172,21 +198,91 @@ class cFigSingleton:
         return self.fig_n_ImgInstruction
      
 
+    @property
+    def cache_ttl(self)-> float:
+        return self.figCacheTTL
+
+    @property
+    def cache_max_entries(self)-> int:
+        return self.figCacheMaxEntries
+
+    @property
+    def cache_max_disk_entries(self)-> int:
+        return self.figCacheMaxDiskEntries
+
+    @property
+    def style_info_prewarm(self)-> bool:
+        return self.figStyleInfoPrewarm
+
+    def response_cache(self, namespace:str='responses', persistent:bool=False)-> ResponseCache:
+        #Shared, configured response cache for a namespace, persistent caches don't expire
+        return ResponseCache.get_cache(namespace,
+                                       ttl_seconds=0 if persistent else self.figCacheTTL,
+                                       max_entries=self.figCacheMaxEntries,
+                                       max_disk_entries=self.figCacheMaxDiskEntries)
+
+    def image_cache(self)-> ImageArtifactCache:
+        #Shared on-disk cache of generated images, limited to image_cache_max_mb
+        cache = ImageArtifactCache()
+        cache.max_bytes = self.figImageCacheMaxBytes
+        return cache
+
     @property
     def pyexiv2(self)-> Optional[object]:
+        #Pyexiv2 seems to have trouble loading with some Python versions (it's misreading the vesrion number)
+        #So I'll open it in a try block so as not to stop the whole suite from loading
+        if not self._pyexiv2_loaded:
+            with self._load_lock:
+                if not self._pyexiv2_loaded:
+                    try:
+                        import pyexiv2
+                        self._pyexiv2 = pyexiv2
+                    except Exception as e:
+                        self._pyexiv2 = None
+                        json_manager().log_events(f"The Pyexiv2 library failed to load with Error: {e} ",
+                                                  TroubleSgltn.Severity.ERROR)
+                    self._pyexiv2_loaded = True
         return self._pyexiv2
 
         
     @property
     def openaiClient(self)-> Optional[openai.OpenAI]:
-        if self._figKey:
-            return self.figOAIClient
-        else:
+        if not self._figKey:
+            return None
+        if not self._client_created:
+            with self._load_lock:
+                if not self._client_created:
+                    self.figOAIClient = self.create_client()
+                    self._client_created = True
+        return self.figOAIClient
+
+
+    def create_client(self)-> Optional[openai.OpenAI]:
+        #Creates the OpenAI client, the first node that makes a request imports openai
+        try:
+            # One pooled keep-alive httpx client so repeat calls skip the TCP+TLS handshake
+            self.figHttpClient = httpx.Client(
+                limits=httpx.Limits(max_connections=self.figPoolSize,
+                                    max_keepalive_connections=self.figPoolSize),
+                timeout=httpx.Timeout(self.figTimeout, connect=10.0)
+            )
+            return openai.OpenAI(api_key= self._figKey,
+                                 base_url=self.figBaseUrl or None,
+                                 timeout=self.figTimeout,
+                                 max_retries=0, #Retries are handled by RequestScheduler
+                                 http_client=self.figHttpClient)
+        except Exception as e:
+            json_manager().log_events("Invalid or missing OpenAI API key.  Please note, keys must now be kept in an environment variable (see: ReadMe)",
+                                      severity=TroubleSgltn.Severity.ERROR)
             return None
 
 
 class Enhancer:
 #Build a creative prompt using a ChatGPT model    
+
+    #Text icgptRequest returns in place of a response when a request can't be completed
+    NO_KEY_RESPONSE = "Invalid or missing OpenAI API key.  Keys must be stored in an environment variable (see: ReadMe). ChatGPT request aborted"
+    FAILED_RESPONSE = "ChatGPT was unable to process the request"
    
     def __init__(self):
         #instantiate Configuration and Help data classes
@@ -265,7 +361,10 @@ class Enhancer:
         return None if sus_var == "undefined" else sus_var
  
     @staticmethod
-    def icgptRequest(GPTmodel:str, creative_latitude:float, tokens:int,  prompt:Union[str,None]="", prompt_style:str="", instruction:str="", image:Union[str,None]="", file:str="")->Union[str,None]:
+    def icgptRequest(GPTmodel:str, creative_latitude:float, tokens:int,  prompt:Union[str,None]="", prompt_style:str="", instruction:str="", image:Union[str,list,None]="", file:str="", 
+                     cache_mode:Union[str,CacheMode]=CacheMode.OFF, cache_namespace:str='responses', cache_key:str="",
+                     stream:bool=False, progress_hook:Optional[Callable[[str], None]]=None,
+                     image_mime:str="image/jpeg", image_detail:str="auto")->Union[str,None]:
         """
         Accesses an OpenAI API client and uses the incoming arguments to construct a JSON that contains the request for an LLM response.
         Sends the request via the client. Handles the OpenAI return object and extacts the model and the response from it.
@@ -277,8 +376,15 @@ class Enhancer:
             prompt (str): The users' request to action by the LLM
             prompt_style (str): Determines the writing style of the return value
             instruction (str): Text describing the conditions and specific requirements of the return value
-            image (b64 JSON/str): An image to be evaluated by the LLM in the context of the instruction
+            image (b64 JSON/str or list): An image, or a list of images, to be evaluated by the LLM in the context of the instruction
             file (JSON/str): A text file containing information to be analysed by the LLM per the instruction
+            cache_mode (str/CacheMode): Whether to read and/or write the response cache keyed by the full request payload
+            cache_namespace (str): The response cache to use, caches other than 'responses' don't expire
+            cache_key (str): Overrides the payload hash when the response only depends on some of the inputs
+            stream (bool): Consume the response as a stream of tokens and log time-to-first-token and tokens/sec
+            progress_hook (Callable): Called with each chunk of text as it arrives when streaming
+            image_mime (str): The MIME type of the encoded image
+            image_detail (str): The vision 'detail' setting: 'low', 'high' or 'auto'
 
         Return:
             A string consisting of the LLM's response to the instruction and prompt in the context of any image and/or file
@@ -293,7 +399,7 @@ class Enhancer:
             j_mngr.log_events("Invalid or missing OpenAI API key.  Keys must be stored in an environment variable (see: ReadMe). ChatGPT request aborted",
                                    TroubleSgltn.Severity.ERROR,
                                     True)
-            CGPT_response = "Invalid or missing OpenAI API key.  Keys must be stored in an environment variable (see: ReadMe). ChatGPT request aborted"
+            CGPT_response = Enhancer.NO_KEY_RESPONSE
             return(CGPT_response)
         
         #These will be empty strings unless cFig.use_examples is set to True
@@ -301,20 +407,13 @@ class Enhancer:
         example2 = cFig.example2
         n_example = cFig.n_Example
         n_example2 = cFig.n_example2
+        messages = []
+
         # There's an image
         if image:
                 
             GPTmodel = "gpt-4-vision-preview"  # Use vision model for image
-            image_url = f"data:image/jpeg;base64,{image}"  # Assuming image is base64 encoded
-
-           # messages.append({"role": "system", "content": {"type": "image_url", "image_url": {"url": image_url}}})
-
-            headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {cFig.key}" 
-            }
-            # messages list
-            messages = []
+            images = image if isinstance(image, list) else [image]
 
             # Append the user message
             user_content = []
@@ -322,64 +421,32 @@ class Enhancer:
                 #prompt = "PROMPT: " + prompt
                 user_content.append({"type": "text", "text": prompt})
 
-            user_content.append({"type": "image_url", "image_url": {"url": image_url}})
+            # Every image is attached to the same request
+            for b64_image in images:
+                image_url = f"data:{image_mime};base64,{b64_image}"
+                user_content.append({"type": "image_url", "image_url": {"url": image_url, "detail": image_detail}})
             messages.append({"role": "user", "content": user_content})
 
             # Append the system message if instruction is present
             if instruction:
                 messages.append({"role": "system", "content": instruction})
-            # Append the example in the assistant role
-            # But only if it's not in image + prompt mode, this mode works better with just the instruction
-            # Examples seem to make it difficult for the model to integrate the prompt and imag
-            if cFig.use_examples:
-                if prompt_style == "Narrative":
-                    if n_example:
-                        messages.append({"role": "assistant", "content": n_example})
-                    if n_example2:
-                        messages.append({"role": "assistant", "content": n_example2})
-                else:
-                    if example:
-                        messages.append({"role": "assistant", "content": example})
-                    if example2:
-                        messages.append({"role": "assistant", "content": example2})
 
-            payload = {
-            "model": GPTmodel,
-            "max_tokens": tokens,
-            "temperature": creative_latitude,
-            "messages": messages
-            }
-
-            response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-
-            response_json = response.json()
-            if not 'error' in response_json and response:
-                j_mngr.log_events(f"Using OpenAI model: {response_json['model']}",
-                                    is_trouble= True)
-                CGPT_response = Enhancer.clean_response_text(response_json['choices'][0]['message']['content'] )
-            else:
-                CGPT_response = 'ChatGPT was unable to process this request'
-                j_mngr.log_events("ChatGPT was unable to process the request with image",
-                                  TroubleSgltn.Severity.ERROR,
-                                  True)
-            return CGPT_response
-        
         # No image
-        messages = []
-
-        if instruction:
-            messages.append({"role": "system", "content": instruction})
+        else:
+            if instruction:
+                messages.append({"role": "system", "content": instruction})
 
-        if file:
-            messages.append({"role": "user", "content": file})
+            if file:
+                messages.append({"role": "user", "content": file})
 
-        if prompt:
-            messages.append({"role": "user", "content": prompt})
-        elif not file:
-            # User has provided no prompt, file or image
-            response = "empty box with 'NOTHING' printed on its side bold letters small flying moths, dingy, gloomy, dim light rundown warehouse"
-            return response
+            if prompt:
+                messages.append({"role": "user", "content": prompt})
+            elif not file:
+                # User has provided no prompt, file or image
+                response = "empty box with 'NOTHING' printed on its side bold letters small flying moths, dingy, gloomy, dim light rundown warehouse"
+                return response
 
+        # Append the examples in the assistant role
         if cFig.use_examples:
             if prompt_style == "Narrative":
                 if n_example:
@@ -393,16 +460,39 @@ class Enhancer:
                         messages.append({"role": "assistant", "content": example2})
             
 
+        payload = {
+            "model": GPTmodel,
+            "messages": messages,
+            "temperature": creative_latitude,
+            "max_tokens": tokens
+        }
+
+        cache_mode = CacheMode.from_ui(cache_mode)
+        cache = None
+        if cache_mode != CacheMode.OFF:
+            cache = cFig.response_cache(cache_namespace, cache_namespace != 'responses')
+            cache_key = cache_key or ResponseCache.make_key(payload)
+            cached_response = cache.get(cache_key)
+            j_mngr.log_events(f"Response cache {'hit' if cached_response is not None else 'miss'}. {cache.stats()}",
+                              is_trouble=True)
+            if cached_response is not None:
+                return cached_response
+
+        # Text and vision requests both go through the client's pooled transport
+        response_model = ""
+        response_text = None
         try:
-            response = client.chat.completions.create(
-                model=GPTmodel,
-                messages=messages,
-                temperature=creative_latitude,
-                max_tokens=tokens
-            )
+            scheduler = RequestScheduler()
+            if stream:
+                response_model, response_text = scheduler.call(Enhancer.stream_completion, client, payload, progress_hook,
+                                                               description="ChatGPT request")
+            else:
+                response = scheduler.call(client.chat.completions.create, description="ChatGPT request", **payload)
+                if response and not 'error' in response:
+                    response_model, response_text = response.model, response.choices[0].message.content
 
         except openai.APIConnectionError as e: # from httpx.
-            j_mngr.log_events("ChatGPT server connection error: {e.__cause__}",                                   
+            j_mngr.log_events(f"ChatGPT server connection error: {e.__cause__}",                                   
                                     TroubleSgltn.Severity.ERROR,
                                     True)
         except openai.RateLimitError as e:
@@ -419,18 +509,166 @@ class Enhancer:
                                     True)
 
 
-        if not 'error' in response and response:
-            j_mngr.log_events(f"Using OpenAI model: {response.model}",
+        if response_text is not None:
+            j_mngr.log_events(f"Using OpenAI model: {response_model}",
                                is_trouble=True)
-            CGPT_response = response.choices[0].message.content
+            #Only vision responses are cleaned, text responses keep their paragraph breaks
+            CGPT_response = Enhancer.clean_response_text(response_text) if image else response_text
+            if cache and cache_mode == CacheMode.READ_WRITE:
+                cache.put(cache_key, CGPT_response)
         else:
-            CGPT_response = "ChatGPT was unable to process the request"
+            CGPT_response = Enhancer.FAILED_RESPONSE
             j_mngr.log_events('ChatGPT was unable to process this request.',
                                 TroubleSgltn.Severity.ERROR,
                                 True)
         return CGPT_response
         
     
+    @staticmethod
+    def stream_completion(client, payload:dict, progress_hook:Optional[Callable[[str], None]]=None)-> tuple[str, str]:
+        """
+        Sends a chat completion request as a stream and assembles the response text as the chunks arrive.
+        Logs the time to first token and the token rate, each content chunk is counted as one token.
+
+        Args:
+            client (OpenAI): The OpenAI client
+            payload (dict): The keyword arguments for chat.completions.create
+            progress_hook (Callable): Optional, called with each chunk of text as it arrives
+
+        Returns:
+            tuple: (model name, raw response text)
+        """
+        j_mngr = json_manager()
+        start_time = time.perf_counter()
+        first_token_time = None
+        token_count = 0
+        model = ""
+        parts = []
+
+        for chunk in client.chat.completions.create(**payload, stream=True):
+            model = chunk.model or model
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                token_count += 1
+                parts.append(delta)
+                if progress_hook:
+                    progress_hook(delta)
+
+        end_time = time.perf_counter()
+        if first_token_time is not None:
+            ttft = first_token_time - start_time
+            gen_time = end_time - first_token_time
+            rate = token_count / gen_time if gen_time > 0 else 0
+            j_mngr.log_events(f"Streamed {token_count} tokens: time to first token {ttft:.2f}s, {rate:.1f} tokens/sec, total {end_time - start_time:.2f}s",
+                              is_trouble=True)
+
+        return model, "".join(parts)
+
+
+    @staticmethod
+    def vision_size(width:int, height:int, detail:str)-> tuple[int, int, int]:
+        """
+        Works out the pixel dimensions the vision model will actually use for an image, and its token cost.
+        'low' detail images are fit into 512x512 for a flat 85 tokens.  'high' detail images are fit into
+        2048x2048, then scaled so the short side is at most 768, and cost 170 tokens per 512px tile plus 85.
+        'auto' is sized and costed as 'high', the most it can cost.  Images are never scaled up.
+
+        Returns:
+            tuple: (width, height, estimated tokens)
+        """
+        if detail == "low":
+            scale = min(1.0, 512 / max(width, height))
+            return max(1, round(width * scale)), max(1, round(height * scale)), 85
+
+        scale = min(1.0, 2048 / max(width, height))
+        short_side = min(width, height) * scale
+        if short_side > 768:
+            scale *= 768 / short_side
+        new_width, new_height = max(1, round(width * scale)), max(1, round(height * scale))
+        tiles = math.ceil(new_width / 512) * math.ceil(new_height / 512)
+        return new_width, new_height, 85 + 170 * tiles
+
+
+    def prepare_vision_image(self, image:torch.Tensor, detail:str="auto", img_format:str="JPEG", quality:int=85,
+                             compress_level:int=1, max_edge:int=0)-> tuple[list, str]:
+        """
+        Resizes an image tensor to the pixels the vision model will use at the chosen detail level,
+        then encodes it.  Every image in a batch is encoded.  Logs the estimated image token cost.
+
+        Returns:
+            tuple: (list of base64 images, MIME type)
+        """
+        height, width = image.shape[-3], image.shape[-2]
+        new_width, new_height, image_tokens = self.vision_size(width, height, detail)
+        if max_edge and max(new_width, new_height) > max_edge:
+            scale = max_edge / max(new_width, new_height)
+            new_width, new_height = max(1, round(new_width * scale)), max(1, round(new_height * scale))
+            image_tokens = 85 if detail == "low" else 85 + 170 * math.ceil(new_width / 512) * math.ceil(new_height / 512)
+
+        image_count = image.shape[0] if image.ndim == 4 else 1
+        self.j_mngr.log_events(f"Vision image(s): {image_count} x {width}x{height} sent as {new_width}x{new_height} with '{detail}' detail, estimated cost: {image_tokens * image_count} tokens",
+                               is_trouble=True)
+        img_format = img_format.upper()
+        b64_images = DalleImage.tensors_to_base64(image, img_format, quality, compress_level, size=(new_width, new_height))
+        return b64_images, DalleImage.MIME_TYPES.get(img_format, "image/png")
+
+
+    _prewarmed_models = set()
+    _prewarm_lock = threading.Lock()
+
+    def get_style_info(self, GPTmodel:str, creative_latitude:float, tokens:int, style:str)-> str:
+        """
+        Returns the backgrounder on an art style.  The text depends only on the style and the model,
+        so it's kept in a persistent store and only requested from ChatGPT the first time.
+
+        Args:
+            GPTmodel (str): The ChatGPT model that writes the backgrounder
+            creative_latitude (float): Temperature used if the backgrounder has to be requested
+            tokens (int): Token limit used if the backgrounder has to be requested
+            style (str): The art style
+
+        Returns:
+            str: The backgrounder text or ChatGPT's error message
+        """
+        sty_prompt = "Give an 150 word backgrounder on the art style: {}.  Starting with describing what it is, include information about its history and which artists represent the style."
+        sty_prompt = sty_prompt.format(style)
+        style_key = ResponseCache.make_key({"model": GPTmodel, "style": style})
+
+        return self.icgptRequest(GPTmodel, creative_latitude, tokens, sty_prompt,
+                                 cache_mode=CacheMode.READ_WRITE, cache_namespace='style_info', cache_key=style_key)
+
+
+    def prewarm_style_info(self, GPTmodel:str, creative_latitude:float, tokens:int, max_workers:int=4)-> None:
+        """
+        Fills the style backgrounder store for every style in config.json on a background thread.
+        Only runs once per model per session, styles that are already stored are not requested again.
+        """
+        with Enhancer._prewarm_lock:
+            if GPTmodel in Enhancer._prewarmed_models:
+                return
+            Enhancer._prewarmed_models.add(GPTmodel)
+
+        store = self.cFig.response_cache('style_info', True)
+        missing = [style for style in self.cFig.style
+                   if store.get(ResponseCache.make_key({"model": GPTmodel, "style": style})) is None]
+        if not missing:
+            return
+
+        def warm():
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for style in missing:
+                    TroubleSgltn.submit(executor, self.get_style_info, GPTmodel, creative_latitude, tokens, style)
+            self.j_mngr.log_events(f"Style info store pre-warmed for {len(missing)} styles using model: {GPTmodel}")
+
+        self.j_mngr.log_events(f"Pre-warming style info for {len(missing)} styles in the background",
+                               is_trouble=True)
+        threading.Thread(target=TroubleSgltn.bind(warm), name="Plush-style-info-prewarm", daemon=True).start()
+
+
     @classmethod
     def INPUT_TYPES(cls):
         iFig=cFigSingleton()
@@ -449,7 +687,14 @@ class Enhancer:
             },
             "optional": {  
                 "prompt": ("STRING",{"multiline": True, "default": ""}),          
-                "image" : ("IMAGE", {"default": None})
+                "image" : ("IMAGE", {"default": None}),
+                "cache_mode": (CacheMode.ui_list(), {"default": CacheMode.OFF.value}),
+                "stream_response": ("BOOLEAN", {"default": False}),
+                "image_format": (["JPEG", "WEBP", "PNG"], {"default": "JPEG"}),
+                "image_quality": ("INT", {"max": 100, "min": 1, "step": 1, "default": 85, "display": "number"}),
+                "png_compression": ("INT", {"max": 9, "min": 0, "step": 1, "default": 1, "display": "number"}),
+                "max_image_edge": ("INT", {"max": 4096, "min": 0, "step": 64, "default": 2048, "display": "number"}),
+                "image_detail": (["auto", "low", "high"], {"default": "auto"})
             }
         } 
 
@@ -463,12 +708,14 @@ class Enhancer:
     CATEGORY = "Plush/OpenAI"
  
 
-    def gogo(self, GPTmodel, creative_latitude, tokens, style, artist, prompt_style, max_elements, style_info, prompt="", image=None):
+    def gogo(self, GPTmodel, creative_latitude, tokens, style, artist, prompt_style, max_elements, style_info, prompt="", image=None, cache_mode=CacheMode.OFF.value, stream_response=False,
+             image_format="JPEG", image_quality=85, png_compression=1, max_image_edge=2048, image_detail="auto"):
         self.trbl.reset('Style Prompt')
         help = self.help_data.style_prompt_help
         CGPT_prompt = ""
         instruction = ""
         CGPT_styleInfo = ""
+        image_mime = "image/jpeg"
 
         if not self.cFig.openaiClient:
             self.j_mngr.log_events("OpenAI API key is missing or invalid.  Key must be stored in an enviroment variable (see ReadMe).  This node is not functional.",
@@ -485,7 +732,7 @@ class Enhancer:
         #Convert PyTorch.tensor to B64encoded image
         if isinstance(image, torch.Tensor):
 
-            image = DalleImage.tensor_to_base64(image)
+            image, image_mime = self.prepare_vision_image(image, image_detail, image_format, image_quality, png_compression, max_image_edge)
 
         #build instruction based on user input
         mode = 0
@@ -498,19 +745,243 @@ class Enhancer:
 
         instruction = self.build_instruction(mode, style, prompt_style, max_elements, artist)  
 
-        if style_info:
-            #User has request information about the art style.  GPT will provide it
-            sty_prompt = "Give an 150 word backgrounder on the art style: {}.  Starting with describing what it is, include information about its history and which artists represent the style."
-            sty_prompt = sty_prompt.format(style)
- 
-            CGPT_styleInfo = self.icgptRequest(GPTmodel, creative_latitude, tokens, sty_prompt )
-
-        CGPT_prompt = self.icgptRequest(GPTmodel, creative_latitude, tokens, prompt, prompt_style, instruction, image)
+        # The style backgrounder and the prompt are independent so they're requested at the same time
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            style_future = None
+            if style_info:
+                #User has request information about the art style.  GPT will provide it
+                style_future = TroubleSgltn.submit(executor, self.get_style_info, GPTmodel, creative_latitude, tokens, style)
+
+            progress_hook = None
+            if stream_response:
+                # Advance the node's progress bar as tokens arrive
+                pbar = comfy.utils.ProgressBar(tokens)
+                progress_hook = lambda chunk: pbar.update(1)
+
+            prompt_future = TroubleSgltn.submit(executor, self.icgptRequest, GPTmodel, creative_latitude, tokens, prompt, prompt_style, instruction, image,
+                                                cache_mode=cache_mode, stream=stream_response, progress_hook=progress_hook,
+                                                image_mime=image_mime, image_detail=image_detail)
+
+            CGPT_prompt = prompt_future.result()
+
+            if style_future:
+                # A failed backgrounder is reported but doesn't affect the prompt
+                try:
+                    CGPT_styleInfo = style_future.result()
+                except Exception as e:
+                    CGPT_styleInfo = "Style information could not be retrieved"
+                    self.j_mngr.log_events(f"Style info request failed: {e}",
+                                           TroubleSgltn.Severity.WARNING,
+                                           True)
+
+        if style_info and self.cFig.style_info_prewarm:
+            self.prewarm_style_info(GPTmodel, creative_latitude, tokens)
 
     
         return (CGPT_prompt, instruction, CGPT_styleInfo, help, self.trbl.get_troubles())
 
 
+class BatchEnhancer:
+#Expand a list of prompts with the Style Prompt instruction, several requests at a time
+
+    def __init__(self):
+        self.cFig = cFigSingleton()
+        self.help_data = helpSgltn()
+        self.j_mngr = json_manager()
+        self.trbl = TroubleSgltn()
+        self.enhancer = Enhancer()
+
+
+    def read_prompts(self, prompts:str, prompt_file:str="")-> list:
+        """
+        Collects the seed prompts, one per line, from the multiline input and/or a text file.
+        Blank lines are skipped.
+
+        Args:
+            prompts (str): Multiline text with one prompt per line
+            prompt_file (str): Optional path to a text file with one prompt per line
+
+        Returns:
+            list: The prompts in input order
+        """
+        lines = prompts.splitlines() if prompts else []
+        prompt_file = prompt_file.strip() if prompt_file else ""
+        if prompt_file:
+            try:
+                with open(prompt_file, 'r', encoding='utf-8') as file:
+                    lines.extend(file.read().splitlines())
+            except (OSError, UnicodeDecodeError) as e:
+                self.j_mngr.log_events(f"Unable to read prompt file: {prompt_file}: {e}",
+                                       TroubleSgltn.Severity.ERROR,
+                                       True)
+        return [line.strip() for line in lines if line.strip()]
+
+
+    def load_checkpoint(self, checkpoint_path:str, prompt_list:list)-> dict:
+        """
+        Reads the results of an earlier, possibly interrupted, run.  Entries whose prompt
+        doesn't match the current list at that position are ignored.
+
+        Returns:
+            dict: Completed results keyed by prompt index
+        """
+        done = {}
+        if not os.path.isfile(checkpoint_path):
+            return done
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        #A partially written last line from an interrupted run
+                        continue
+                    index = entry.get('index')
+                    if isinstance(index, int) and 0 <= index < len(prompt_list) and entry.get('prompt') == prompt_list[index]:
+                        done[index] = entry.get('response', '')
+        except OSError as e:
+            self.j_mngr.log_events(f"Unable to read checkpoint file: {checkpoint_path}: {e}",
+                                   TroubleSgltn.Severity.WARNING,
+                                   True)
+        return done
+
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        iFig=cFigSingleton()
+
+        return {
+            "required": {
+                "GPTmodel": (["gpt-3.5-turbo","gpt-4","gpt-4-turbo-preview"],{"default": "gpt-4-turbo-preview"} ),
+                "creative_latitude" : ("FLOAT", {"max": 1.201, "min": 0.1, "step": 0.1, "display": "number", "round": 0.1, "default": 0.7}),
+                "tokens" : ("INT", {"max": 8000, "min": 20, "step": 10, "default": 500, "display": "number"}),
+                "style": (iFig.style,{"default": "Photograph"}),
+                "artist" : ("INT", {"max": 3, "min": 0, "step": 1, "default": 1, "display": "number"}),
+                "prompt_style": (["Tags", "Narrative"],{"default": "Tags"}),
+                "max_elements" : ("INT", {"max": 25, "min": 3, "step": 1, "default": 10, "display": "number"}),
+                "prompts": ("STRING",{"multiline": True, "default": ""}),
+                "max_concurrency": ("INT", {"max": 32, "min": 1, "step": 1, "default": 4, "display": "number"}),
+                "requests_per_minute": ("INT", {"max": 10000, "min": 0, "step": 1, "default": 60, "display": "number"}),
+                "tokens_per_minute": ("INT", {"max": 10000000, "min": 0, "step": 1000, "default": 0, "display": "number"}),
+                "resume": ("BOOLEAN", {"default": True})
+            },
+            "optional": {
+                "prompt_file": ("STRING",{"multiline": False, "default": ""}),
+                "cache_mode": (CacheMode.ui_list(), {"default": CacheMode.OFF.value})
+            }
+        }
+
+    RETURN_TYPES = ("STRING", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("CGPTprompts", "CGPTinstruction", "Help", "troubleshooting")
+    OUTPUT_IS_LIST = (True, False, False, False)
+
+    FUNCTION = "gogo"
+
+    OUTPUT_NODE = False
+
+    CATEGORY = "Plush/OpenAI"
+
+
+    def gogo(self, GPTmodel, creative_latitude, tokens, style, artist, prompt_style, max_elements, prompts,
+             max_concurrency, requests_per_minute, tokens_per_minute, resume, prompt_file="", cache_mode=CacheMode.OFF.value):
+
+        self.trbl.reset('Batch Style Prompt')
+        help = self.help_data.batch_style_prompt_help
+        instruction = ""
+        results = []
+
+        if not self.cFig.openaiClient:
+            self.j_mngr.log_events("OpenAI API key is missing or invalid.  Key must be stored in an enviroment variable (see ReadMe).  This node is not functional.",
+                                   TroubleSgltn.Severity.WARNING,
+                                   True)
+            return(results, instruction, help, self.trbl.get_troubles())
+
+        prompt_list = self.read_prompts(self.enhancer.undefined_to_none(prompts), self.enhancer.undefined_to_none(prompt_file))
+        if not prompt_list:
+            self.j_mngr.log_events("No prompts were provided, enter one prompt per line or the path of a prompt file",
+                                   TroubleSgltn.Severity.WARNING,
+                                   True)
+            return(results, instruction, help, self.trbl.get_troubles())
+
+        GPTmodel = self.enhancer.translateModelName(GPTmodel)
+        instruction = self.enhancer.build_instruction(InputMode.PROMPT_ONLY, style, prompt_style, max_elements, artist)
+
+        #The checkpoint file is specific to this prompt list and these settings
+        run_key = ResponseCache.make_key({"model": GPTmodel, "temperature": creative_latitude, "max_tokens": tokens,
+                                          "instruction": instruction, "prompt_style": prompt_style, "prompts": prompt_list})
+        checkpoint_dir = self.j_mngr.find_child_directory(self.j_mngr.cache_dir, 'batch_checkpoints', True)
+        checkpoint_path = self.j_mngr.append_filename_to_path(checkpoint_dir, f"{run_key}.jsonl")
+
+        responses = self.load_checkpoint(checkpoint_path, prompt_list) if resume else {}
+        if responses:
+            self.j_mngr.log_events(f"Resuming batch: {len(responses)} of {len(prompt_list)} prompts were already expanded",
+                                   is_trouble=True)
+        pending = [i for i in range(len(prompt_list)) if i not in responses]
+
+        request_bucket = TokenBucket(requests_per_minute)
+        token_bucket = TokenBucket(tokens_per_minute)
+        checkpoint_lock = threading.Lock()
+        pbar = comfy.utils.ProgressBar(len(prompt_list))
+        pbar.update_absolute(len(responses))
+        failed = 0
+
+        def expand(index):
+            seed_prompt = prompt_list[index]
+            request_bucket.acquire()
+            #Rough token estimate: ~4 characters per token for the input plus the response limit
+            token_bucket.acquire((len(instruction) + len(seed_prompt)) / 4 + tokens)
+            response = Enhancer.icgptRequest(GPTmodel, creative_latitude, tokens, seed_prompt, prompt_style, instruction, cache_mode=cache_mode)
+            if response in (Enhancer.FAILED_RESPONSE, Enhancer.NO_KEY_RESPONSE):
+                return index, None
+            with checkpoint_lock:
+                self.j_mngr.append_to_file(json.dumps({"index": index, "prompt": seed_prompt, "response": response}),
+                                           checkpoint_path, False)
+            return index, response
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            futures = [TroubleSgltn.submit(executor, expand, i) for i in pending]
+            for future in as_completed(futures):
+                try:
+                    index, response = future.result()
+                except Exception as e:
+                    self.j_mngr.log_events(f"Unexpected error expanding a prompt: {e}",
+                                           TroubleSgltn.Severity.ERROR,
+                                           True)
+                    failed += 1
+                    continue
+                if response is None:
+                    failed += 1
+                else:
+                    responses[index] = response
+                pbar.update(1)
+
+        elapsed = time.perf_counter() - start_time
+        completed = len(pending) - failed
+        rate = completed / elapsed * 60 if elapsed > 0 else 0
+        self.j_mngr.log_events(f"Expanded {completed} prompts in {elapsed:.1f}s ({rate:.1f} prompts/min) with {max_concurrency} concurrent requests",
+                               is_trouble=True)
+        if failed:
+            self.j_mngr.log_events(f"{failed} of {len(prompt_list)} prompts could not be expanded, queue the node again to retry them",
+                                   TroubleSgltn.Severity.WARNING,
+                                   True)
+        else:
+            #The run is finished, only interrupted or partly failed runs keep their checkpoint to resume from
+            try:
+                if os.path.exists(checkpoint_path):
+                    os.remove(checkpoint_path)
+            except OSError as e:
+                self.j_mngr.log_events(f"Unable to delete the batch checkpoint file {checkpoint_path}: {e}",
+                                       TroubleSgltn.Severity.WARNING)
+
+        #Results are returned in input order, prompts that failed return an empty string
+        results = [responses.get(i, "") for i in range(len(prompt_list))]
+
+        return(results, instruction, help, self.trbl.get_troubles())
+
+
 class DalleImage:
 #Accept a user prompt and parameters to produce a Dall_e generated image
 
@@ -521,7 +992,7 @@ class DalleImage:
         self.trbl = TroubleSgltn()
 
     @staticmethod    
-    def b64_to_tensor( b64_image: str) -> tuple[torch.Tensor,torch.Tensor]:
+    def b64_to_tensor( b64_image: str, out: Optional[torch.Tensor] = None) -> tuple[torch.Tensor,torch.Tensor]:
 
         """
         Converts a base64-encoded image to a torch.Tensor.
@@ -529,68 +1000,156 @@ class DalleImage:
         Note: ComfyUI expects the image tensor in the [N, H, W, C] format.  
         For example with the shape torch.Size([1, 1024, 1024, 3])
 
+        The image is decoded to a uint8 array with only the channels it has, then converted and 
+        normalised straight into its float32 destination, so no full size float RGBA copy is made.
+
         Args:
             b64_image (str): The b64 image to convert.
+            out (torch.Tensor): Optional preallocated [H, W, 3] float32 tensor, e.g. a slot of a batch tensor,
+                that receives the image.  It's ignored if its shape doesn't match the image.
 
         Returns:
-            torch.Tensor: an image Tensor.
+            tuple: an image Tensor [1, H, W, 3] (a view of 'out' when it's used) and a mask Tensor [1, H, W].
         """        
-        # Decode the base64 string
+        # Decode the base64 string, BytesIO shares the decoded bytes rather than copying them
         image_data = base64.b64decode(b64_image)
         
         # Open the image with PIL and handle EXIF orientation
-        image = Image.open(BytesIO(image_data))
-        image = ImageOps.exif_transpose(image)
-        
-        # Convert to RGBA for potential alpha channel handling
-        # Dalle doesn't provide an alpha channel, but this is here for
-        # broad compatibility
-        image = image.convert("RGBA")
-        image_np = np.array(image).astype(np.float32) / 255.0  # Normalize
-
-        # Split the image into RGB and Alpha channels
-        rgb_np, alpha_np = image_np[..., :3], image_np[..., 3]
-        
-        # Convert RGB to PyTorch tensor and ensure it's in the [N, H, W, C] format
-        tensor_image = torch.from_numpy(rgb_np).unsqueeze(0)  # Adds N dimension
+        with Image.open(BytesIO(image_data)) as image:
+            image = ImageOps.exif_transpose(image)
+
+            # Dalle doesn't provide an alpha channel, only convert to RGBA
+            # when the image actually has one
+            has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+            target_mode = 'RGBA' if has_alpha else 'RGB'
+            if image.mode != target_mode:
+                image = image.convert(target_mode)
+            image_np = np.asarray(image)  # uint8 [H, W, C]
+
+        height, width = image_np.shape[0], image_np.shape[1]
+        if out is None or tuple(out.shape) != (height, width, 3):
+            out = torch.empty((height, width, 3), dtype=torch.float32)
+
+        # uint8 -> float32 conversion happens during the copy, then normalise in place.
+        # The PIL array is read-only, it's only ever read from here so torch's warning doesn't apply
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+            out.copy_(torch.from_numpy(image_np[..., :3]))
+        out.div_(255.0)
+        tensor_image = out.unsqueeze(0)  # Adds N dimension
 
         # Create mask based on the presence or absence of an alpha channel
-        if image.mode == 'RGBA':
-            mask = torch.from_numpy(alpha_np).unsqueeze(0).unsqueeze(0)  # Adds N and C dimensions
+        if has_alpha:
+            mask = torch.from_numpy(image_np[..., 3].astype(np.float32) / 255.0).unsqueeze(0)  # [N, H, W]
         else:  # Fallback if no alpha channel is present
-            mask = torch.zeros((1, tensor_image.shape[2], tensor_image.shape[3]), dtype=torch.float32)  # [N, H, W]
+            mask = torch.zeros((1, height, width), dtype=torch.float32)  # [N, H, W]
 
         return tensor_image, mask
     
 
+    #MIME types of the formats tensor_to_base64 can produce
+    MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
     @staticmethod
-    def tensor_to_base64(tensor: torch.Tensor) -> str:
+    def encode_frame(image_np: np.ndarray, img_format: str = "PNG", quality: int = 85, compress_level: int = 6) -> str:
         """
-        Converts a PyTorch tensor to a base64-encoded image.
-
-        Note: ComfyUI provides the image tensor in the [N, H, W, C] format.  
-        For example with the shape torch.Size([1, 1024, 1024, 3])
+        Encodes one [H, W, C] uint8 frame as a base64 image string.
 
         Args:
-            tensor (torch.Tensor): The image tensor to convert.
+            image_np (np.ndarray): The uint8 image array
+            img_format (str): 'PNG', 'JPEG' or 'WEBP'
+            quality (int): JPEG/WEBP quality, 1-100
+            compress_level (int): PNG zlib compression level, 0-9.  Lower is faster, higher is smaller
 
         Returns:
             str: Base64-encoded image string.
         """
-    # Convert tensor to PIL Image
-        if tensor.ndim == 4:
-            tensor = tensor.squeeze(0)  # Remove batch dimension if present
-        pil_image = Image.fromarray((tensor.numpy() * 255).astype('uint8'))
+        pil_image = Image.fromarray(image_np)
 
         # Save PIL Image to a buffer
         buffer = BytesIO()
-        pil_image.save(buffer, format="PNG")  # Can change to JPEG if preferred
-        buffer.seek(0)
+        if img_format == "JPEG":
+            if pil_image.mode != "RGB":
+                pil_image = pil_image.convert("RGB")
+            pil_image.save(buffer, format="JPEG", quality=quality)
+        elif img_format == "WEBP":
+            pil_image.save(buffer, format="WEBP", quality=quality)
+        else:
+            pil_image.save(buffer, format="PNG", compress_level=compress_level)
 
         # Encode buffer to base64
-        base64_image = base64.b64encode(buffer.read()).decode('utf-8')
+        return base64.b64encode(buffer.getbuffer()).decode('utf-8')
+
+
+    @staticmethod
+    def tensors_to_base64(tensor: torch.Tensor, img_format: str = "PNG", quality: int = 85, compress_level: int = 6, max_edge: int = 0,
+                          size: Optional[tuple[int, int]] = None, max_workers: int = 8) -> list[str]:
+        """
+        Converts every frame of a PyTorch image batch to a base64-encoded image.  The whole batch is resized and
+        converted to uint8 in single vectorized operations, then the frames are encoded in parallel.
+
+        Note: ComfyUI provides the image tensor in the [N, H, W, C] format.  
+        For example with the shape torch.Size([1, 1024, 1024, 3])
+
+        Args:
+            tensor (torch.Tensor): The image tensor to convert, [N, H, W, C] or [H, W, C]
+            img_format (str): 'PNG', 'JPEG' or 'WEBP'
+            quality (int): JPEG/WEBP quality, 1-100
+            compress_level (int): PNG zlib compression level, 0-9.  Lower is faster, higher is smaller
+            max_edge (int): If > 0, the images are downscaled so their longest edge is no larger than this
+            size (tuple): Optional (width, height) to resize to, overrides max_edge
+            max_workers (int): The most frames encoded at the same time
+
+        Returns:
+            list: Base64-encoded image strings in batch order.
+        """
+        if tensor.ndim == 3:
+            tensor = tensor.unsqueeze(0)  # Add batch dimension if missing
+
+        # Downscale before any conversion, the vision model resizes large images anyway
+        height, width = tensor.shape[1], tensor.shape[2]
+        new_size = None
+        if size:
+            new_size = (size[1], size[0])
+        elif max_edge and max(height, width) > max_edge:
+            scale = max_edge / max(height, width)
+            new_size = (max(1, round(height * scale)), max(1, round(width * scale)))
+        if new_size and new_size != (height, width):
+            tensor = torch.nn.functional.interpolate(tensor.permute(0, 3, 1, 2), size=new_size, mode='area')
+            tensor = tensor.permute(0, 2, 3, 1)
+
+        # Clamp, scale and convert the whole batch to uint8 in one vectorized pass
+        batch_np = tensor.clamp(0, 1).mul(255).round().to(torch.uint8).cpu().numpy()
+
+        img_format = img_format.upper()
+        if len(batch_np) == 1:
+            b64_images = [DalleImage.encode_frame(batch_np[0], img_format, quality, compress_level)]
+        else:
+            # PIL releases the GIL while encoding so the frames encode in parallel
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batch_np)))) as executor:
+                encode = TroubleSgltn.bind(lambda frame: DalleImage.encode_frame(frame, img_format, quality, compress_level))
+                b64_images = list(executor.map(encode, batch_np))
+
+        payload_kb = sum(len(b64_image) for b64_image in b64_images) / 1024
+        json_manager().log_events(f"{len(b64_images)} image(s) encoded as {img_format} {batch_np.shape[2]}x{batch_np.shape[1]}: {payload_kb:.1f} KB payload",
+                                  is_trouble=True)
 
-        return base64_image
+        return b64_images
+
+
+    @staticmethod
+    def tensor_to_base64(tensor: torch.Tensor, img_format: str = "PNG", quality: int = 85, compress_level: int = 6, max_edge: int = 0,
+                         size: Optional[tuple[int, int]] = None) -> str:
+        """
+        Converts the first image of a PyTorch tensor to a base64-encoded image.
+        See tensors_to_base64 for the arguments.
+
+        Returns:
+            str: Base64-encoded image string.
+        """
+        if tensor.ndim == 4:
+            tensor = tensor[:1]  # Only the first image of a batch
+        return DalleImage.tensors_to_base64(tensor, img_format, quality, compress_level, max_edge, size)[0]
 
 
     @classmethod
@@ -607,8 +1166,12 @@ class DalleImage:
                 "image_quality": (["standard", "hd"], {"default": "hd"} ),
                 "style": (["vivid", "natural"], {"default": "natural"} ),
                 "batch_size": ("INT", {"max": 8, "min": 1, "step": 1, "default": 1, "display": "number"}),
-                "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff})
+                "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
+                "max_concurrency": ("INT", {"max": 8, "min": 1, "step": 1, "default": 4, "display": "number"})
             },
+            "optional": {
+                "cache_images": ("BOOLEAN", {"default": False})
+            }
         } 
 
     RETURN_TYPES = ("IMAGE", "STRING","STRING","STRING" )
@@ -620,87 +1183,170 @@ class DalleImage:
 
     CATEGORY = "Plush/OpenAI"
 
-    def gogo(self, GPTmodel, prompt, image_size, image_quality, style, batch_size, seed):
+    def generate_image(self, client, GPTmodel:str, prompt:str, image_size:str, image_quality:str, style:str, batch_size:int)->Optional[tuple[str,str]]:
+        """
+        Sends a single image request to the Dall-e model.  This is the unit of work for each slot in a batch
+        and may run on a worker thread, so errors are logged here rather than raised.
+
+        Args:
+            client (OpenAI): The OpenAI client used to make the request
+            GPTmodel (str): The Dall-e model to use
+            prompt (str): The image prompt
+            image_size (str): The image dimensions as 'WidthxHeight'
+            image_quality (str): 'standard' or 'hd'
+            style (str): 'vivid' or 'natural'
+            batch_size (int): The size of the batch this request belongs to, used in log messages
+
+        Returns:
+            A tuple of (b64 image, revised prompt) or None if the request failed
+        """
+        try:
+            response = RequestScheduler().call(client.images.generate,
+                description = "Dall-e image request",
+                model = GPTmodel,
+                prompt = prompt, 
+                size = image_size,
+                quality = image_quality,
+                style = style,
+                n=1,
+                response_format = "b64_json",
+            )
+
+            if not 'error' in response and response:
+                b64Json = response.data[0].b64_json
+                if b64Json:
+                    return b64Json, response.data[0].revised_prompt
+            self.j_mngr.log_events(f"Dalle-e could not process an image in your batch of: {batch_size} ",
+                                TroubleSgltn.Severity.WARNING,
+                                True)
+        except openai.APIConnectionError as e: 
+            self.j_mngr.log_events(f"ChatGPT server connection error in an image in your batch of {batch_size} Error: {e.__cause__}",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+        except openai.RateLimitError as e:
+            self.j_mngr.log_events(f"ChatGPT RATE LIMIT error in an image in your batch of {batch_size} Error: {e}: (e.response)",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+        except openai.APIStatusError as e:
+            self.j_mngr.log_events(f"ChatGPT STATUS error in an image in your batch of {batch_size}; Error: {e.status_code}: (e.response)",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+        except Exception as e:
+            self.j_mngr.log_events(f"An unexpected error in an image in your batch of {batch_size}; Error:{e}",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+        return None
+
+
+    def gogo(self, GPTmodel, prompt, image_size, image_quality, style, batch_size, seed, max_concurrency=4, cache_images=False):
 
         self.trbl.reset('Dall-e Image')
         seed +=1
         seed -=1
-        # Initialize default tensors and prompt
-        batched_images = torch.zeros(1, 1024, 1024, 3, dtype=torch.float32)
+        # Initialize default prompt, the default tensor is only created if no image is produced
         revised_prompt = "Image and mask could not be created"  # Default prompt message
         help = self.help_data.dalle_help
-        images_list = []
 
         if not self.cFig.openaiClient:
              self.j_mngr.log_events("OpenAI API key is missing or invalid.  Key must be stored in an enviroment variable (see ReadMe).  This node is not functional.",
                                    TroubleSgltn.Severity.WARNING,
                                    True)
-             return(batched_images, revised_prompt, self.trbl.get_troubles())
+             return(torch.zeros(1, 1024, 1024, 3, dtype=torch.float32), revised_prompt, help, self.trbl.get_troubles())
                 
         client = self.cFig.openaiClient
+
+        # A re-queued node with the same settings reloads its images instead of paying for them again
+        image_cache = None
+        cache_key = ""
+        if cache_images:
+            image_cache = self.cFig.image_cache()
+            cache_key = ResponseCache.make_key({"model": GPTmodel, "prompt": prompt, "size": image_size,
+                                                "quality": image_quality, "style": style, "seed": seed,
+                                                "batch_size": batch_size})
+            cached = image_cache.get(cache_key)
+            if cached is not None:
+                images_u8, meta = cached
+                # Same uint8 -> float32 conversion as b64_to_tensor, so the tensor is identical to the original.
+                # The memory-mapped array is read-only, it's only ever read from here
+                batched_images = torch.empty(images_u8.shape, dtype=torch.float32)
+                with warnings.catch_warnings():
+                    warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+                    batched_images.copy_(torch.from_numpy(images_u8))
+                batched_images.div_(255.0)
+                self.j_mngr.log_events(f"Loaded {batched_images.shape[0]} cached images, no Dall-e request was sent",
+                                       is_trouble=True)
+                return (batched_images, meta.get('revised_prompt', revised_prompt), help, self.trbl.get_troubles())
         
         self.j_mngr.log_events(f"Talking to Dalle model: {GPTmodel}",
                                is_trouble=True)
-        
-        have_rev_prompt = False
-        for i in range(batch_size):
+
+        # The output size is known before any request is sent, so the batch tensor is allocated once
+        # and each worker decodes its image straight into the slot for its batch position as soon as it arrives
+        width, height = (int(dim) for dim in image_size.split('x'))
+        output = torch.empty((batch_size, height, width, 3), dtype=torch.float32)
+
+        def fetch_and_decode(slot):
+            result = self.generate_image(client, GPTmodel, prompt, image_size, image_quality, style, batch_size)
+            if result is None:
+                return None
+            b64Json, rev_prompt = result
+            #Convert the b64 json to a pytorch tensor in this image's slot.
+            #A bad image only loses its own slot, the rest of the batch is kept
             try:
-                response = client.images.generate(
-                    model = GPTmodel,
-                    prompt = prompt, 
-                    size = image_size,
-                    quality = image_quality,
-                    style = style,
-                    n=1,
-                    response_format = "b64_json",
-                )
- 
-            # Get the revised_prompt
-                if not 'error' in response and response:
-                    if not have_rev_prompt:
-                        revised_prompt = response.data[0].revised_prompt
-                        have_rev_prompt = True
-                    #Convert the b64 json to a pytorch tensor
-                    b64Json = response.data[0].b64_json
-                    if b64Json:
-                        png_image, mask = self.b64_to_tensor(b64Json)
-                        images_list.append(png_image)
-                    else:
-                        self.j_mngr.log_events(f"Dalle-e could not process an image in your batch of: {batch_size} ",
-                                            TroubleSgltn.Severity.WARNING,
-                                            True)  
-                else:
-                    self.j_mngr.log_events(f"Dalle-e could not process an image in your batch of: {batch_size} ",
-                                        TroubleSgltn.Severity.WARNING,
-                                        True)   
-            except openai.APIConnectionError as e: 
-                self.j_mngr.log_events(f"ChatGPT server connection error in an image in your batch of {batch_size} Error: {e.__cause__}",
-                                        TroubleSgltn.Severity.ERROR,
-                                        True)
-            except openai.RateLimitError as e:
-                self.j_mngr.log_events(f"ChatGPT RATE LIMIT error in an image in your batch of {batch_size} Error: {e}: (e.response)",
-                                        TroubleSgltn.Severity.ERROR,
-                                        True)
-                time.sleep(0.5)
-            except openai.APIStatusError as e:
-                self.j_mngr.log_events(f"ChatGPT STATUS error in an image in your batch of {batch_size}; Error: {e.status_code}: (e.response)",
-                                        TroubleSgltn.Severity.ERROR,
-                                        True)
+                png_image, mask = self.b64_to_tensor(b64Json, out=output[slot])
             except Exception as e:
-                self.j_mngr.log_events(f"An unexpected error in an image in your batch of {batch_size}; Error:{e}",
-                                        TroubleSgltn.Severity.ERROR,
-                                        True)
+                self.j_mngr.log_events(f"Dall-e returned an image that couldn't be decoded in your batch of {batch_size}; Error: {e}",
+                                       TroubleSgltn.Severity.ERROR,
+                                       True)
+                return None
+            if png_image.data_ptr() != output[slot].data_ptr():
+                # The image didn't fit the slot so it was decoded into its own tensor.  It's resized to the batch size
+                # rather than dropped, a batch tensor needs one size for all its images
+                self.j_mngr.log_events(f"Dall-e returned an image of {png_image.shape[2]}x{png_image.shape[1]} instead of {image_size}, image resized",
+                                       TroubleSgltn.Severity.WARNING,
+                                       True)
+                resized = torch.nn.functional.interpolate(png_image.permute(0, 3, 1, 2), size=(height, width),
+                                                          mode='bilinear', align_corners=False, antialias=True)
+                output[slot].copy_(resized[0].permute(1, 2, 0).clamp_(0.0, 1.0))
+            return rev_prompt
+
+        # Send up to max_concurrency requests at once
+        workers = max(1, min(max_concurrency, batch_size))
+        rev_prompts = [None] * batch_size
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {TroubleSgltn.submit(executor, fetch_and_decode, i): i for i in range(batch_size)}
+            for future in as_completed(futures):
+                rev_prompts[futures[future]] = future.result()
+
+        # Pack the successful slots to the front in batch order, then trim to them
+        count = 0
+        for slot, rev_prompt in enumerate(rev_prompts):
+            if rev_prompt is None:
+                continue
+            if count == 0:
+                revised_prompt = rev_prompt
+            if slot != count:
+                output[count].copy_(output[slot])
+            count += 1
                 
-        if images_list:
-            count = len(images_list)
+        if count:
             self.j_mngr.log_events(f'{count} images were processed successfully in your batch of: {batch_size}',
                                    is_trouble=True)
             
-            batched_images = torch.cat(images_list, dim=0)
+            # A view of the successful slots, no copy is made when some images failed
+            batched_images = output[:count]
+
+            # Partial batches aren't cached so a later run can fill in the missing images
+            if image_cache is not None and count == batch_size:
+                images_u8 = batched_images.mul(255.0).round_().to(torch.uint8).numpy()
+                if image_cache.put(cache_key, images_u8, {"revised_prompt": revised_prompt, "created": time.time()}):
+                    self.j_mngr.log_events(f"Saved {count} images to the image cache ({images_u8.nbytes / 1024**2:.1f} MB)",
+                                           is_trouble=True)
         else:
             self.j_mngr.log_events(f'No images were processed in your batch of: {batch_size}',
                                    TroubleSgltn.Severity.WARNING,
                                    is_trouble=True)
+            batched_images = torch.zeros(1, 1024, 1024, 3, dtype=torch.float32)
 
 
         return (batched_images, revised_prompt, help, self.trbl.get_troubles())
@@ -708,6 +1354,10 @@ class DalleImage:
 
 class ImageInfoExtractor:
 
+    #Shared by every Exif Wrangler node:  file fingerprint -> metadata and (fingerprint + filter settings) -> output
+    _meta_memo = LRUCache(32)
+    _output_memo = LRUCache(256)
+
     def __init__(self):
         #self.Enh = Enhancer()
         self.j_mngr = json_manager()
@@ -716,32 +1366,96 @@ class ImageInfoExtractor:
         self.trbl = TroubleSgltn()
 
 
-    def sanitize_data(self, v):
+    def get_image_metadata(self, image_path:str, pyexiv2, write_dir:str='', debug_save:bool=False)-> tuple[Optional[dict], str]:
+        """
+        Reads an image file's info and Exif, Iptc, Xmp and comment data and combines them.  Errors are logged.
 
-        def contains_nonprintable(s):
-            # Tests for the presence of disallowed non printable chars
-            allowed_nonprintables = {'\n', '\r', '\t'}
-            return any(c not in allowed_nonprintables and not c.isprintable() for c in s)
+        Returns:
+            tuple: (working_meta_data, "") or (None, the node output to show when the file couldn't be read)
+        """
+        fatal = False
+        exiv_comment = {}
 
-        if isinstance(v, bytes):
-            # Attempt to decode byte data
-            decoded_str = v.decode('utf-8', errors='replace')
-            # Check if the result contains any non-allowed non-printable characters
-            if not contains_nonprintable(decoded_str):
-                return decoded_str
+        try:
+            #The file is read once, the PNG text and the Exif data are both parsed from these bytes
+            image_data = read_file_bytes(image_path)
+            info = read_image_info(image_data, image_path)
+        except FileNotFoundError:
+            self.j_mngr.log_events(f"Image file not found: {image_path}",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+            fatal = True
+        except PermissionError:
+            self.j_mngr.log_events(f"Permission denied for image file: {image_path}",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+            fatal = True
+        except Image.UnidentifiedImageError as e:
+            self.j_mngr.log_events(f"Exif Wrangler was unable to identify image file: {image_path}; {e}",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+            fatal = True
+        except OSError as e:
+            self.j_mngr.log_events(f"An Error occurred while opening the image file: {e}",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+            fatal = True
+        except ValueError:
+            self.j_mngr.log_events(f"Invalid value for image path: {image_path}",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+            fatal = True
+        except MemoryError:
+            self.j_mngr.log_events(f"Memory error occurred while processing the image.",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+            fatal = True
+        except Exception as e:
+            self.j_mngr.log_events(f"An unexpected error occurred: {e}",
+                                    TroubleSgltn.Severity.ERROR,
+                                    True)
+            fatal = True
+
+        if fatal:
+            return None, "Unable to process request"
+        
+        pyexiv2.set_log_level(4) #Mute log level
+        try:
+            with pyexiv2.ImageData(image_data) as exiv_img:
+                exiv_exif = exiv_img.read_exif()
+                exiv_iptc = exiv_img.read_iptc()
+                exiv_xmp = exiv_img.read_xmp()
+                exiv_comment = exiv_img.read_comment()
+        except Exception as e:
+            self.j_mngr.log_events(f'Unable to process Image file: {e}',
+                                    TroubleSgltn.Severity.WARNING,
+                                    True)
+            return None, "Unable to process image file."
+
+        self.j_mngr.log_events(f"Evaluating image file: '{os.path.basename(image_path)}'",
+                               is_trouble=True)
+
+        working_meta_data = build_meta_data(image_path, info, exiv_exif, exiv_iptc, exiv_xmp, exiv_comment)
+
+        #Print source dict working_meta_data or info to debug issues.
+        if debug_save:
+                debug_file_name = self.j_mngr.generate_unique_filename("json", 'debug_source_file')
+                debug_file_path = self.j_mngr.append_filename_to_path(write_dir,debug_file_name)
+                #debug_json = self.j_mngr.convert_to_json_string(working_meta_data) #all data after first extraction
+                debug_json = self.j_mngr.convert_to_json_string(info) #Raw AI Gen data pre extraction, but w/o Exif info
+                self.j_mngr.write_string_to_file(debug_json,debug_file_path,False)
+
+        return working_meta_data, ""
+
+
+    @staticmethod
+    def file_fingerprint(image_path:str)-> Optional[tuple]:
+        #Identifies a version of a file, None if it can't be read
+        try:
+            stat = os.stat(image_path)
+        except (OSError, ValueError):
             return None
-        elif isinstance(v, TiffImagePlugin.IFDRational):
-            if v.denominator == 0:
-                return None
-            return float(v)
-        elif isinstance(v, tuple):
-            return tuple(self.sanitize_data(t) for t in v if self.sanitize_data(t) is not None)
-        elif isinstance(v, dict):
-            return {kk: self.sanitize_data(vv) for kk, vv in v.items() if self.sanitize_data(vv) is not None}
-        elif isinstance(v, list):
-            return [self.sanitize_data(item) for item in v if self.sanitize_data(item) is not None]
-        else:
-            return v
+        return (os.path.realpath(image_path), stat.st_mtime_ns, stat.st_size)
 
 
     @classmethod
@@ -773,8 +1487,6 @@ class ImageInfoExtractor:
         self.trbl.reset('Exif Wrangler') #Clears all trouble logs before a new run and passes the name of process to head the log lisiing
         help = self.help_data.exif_wrangler_help #Establishes access to help files
         output = "Unable to process request"
-        fatal = False
-        exiv_comment = {}
 
         #Make sure the pyexiv2 supporting library was able to load.  Otherwise exit gogo
         if not self.cFig.pyexiv2:
@@ -812,170 +1524,35 @@ class ImageInfoExtractor:
 
 
 
-        #Start potential separate method: def get_image_metadata()->Tuple
-        #Get general meta-data and exif data and combine them
         image_path = folder_paths.get_annotated_filepath(image)
-        try:
-            with Image.open(image_path) as img:
-                info = img.info
-        except FileNotFoundError:
-            self.j_mngr.log_events(f"Image file not found: {image_path}",
-                                    TroubleSgltn.Severity.ERROR,
-                                    True)
-            fatal = True
-        except PermissionError:
-            self.j_mngr.log_events(f"Permission denied for image file: {image_path}",
-                                    TroubleSgltn.Severity.ERROR,
-                                    True)
-            fatal = True
-        except UnidentifiedImageError as e:
-            self.j_mngr.log_events(f"Exif Wrangler was unable to identify image file: {image_path}; {e}",
-                                    TroubleSgltn.Severity.ERROR,
-                                    True)
-            fatal = True
-        except OSError as e:
-            self.j_mngr.log_events(f"An Error occurred while opening the image file: {e}",
-                                    TroubleSgltn.Severity.ERROR,
-                                    True)
-            fatal = True
-        except ValueError:
-            self.j_mngr.log_events(f"Invalid value for image path: {image_path}",
-                                    TroubleSgltn.Severity.ERROR,
-                                    True)
-            fatal = True
-        except MemoryError:
-            self.j_mngr.log_events(f"Memory error occurred while processing the image.",
-                                    TroubleSgltn.Severity.ERROR,
-                                    True)
-            fatal = True
-        except Exception as e:
-            self.j_mngr.log_events(f"An unexpected error occurred: {e}",
-                                    TroubleSgltn.Severity.ERROR,
-                                    True)
-            fatal = True
-
-        if fatal:
-            return(output,help,self.trbl.get_troubles())
-        
-        img_file_name = os.path.basename(image_path)
-
-        pyexiv2.set_log_level(4) #Mute log level
-        try:
-            with pyexiv2.Image(image_path) as exiv_img:
-                exiv_exif = exiv_img.read_exif()
-                exiv_iptc = exiv_img.read_iptc()
-                exiv_xmp = exiv_img.read_xmp()
-                exiv_comment = exiv_img.read_comment()
-        except Exception as e:
-            self.j_mngr.log_events(f'Unable to process Image file: {e}',
-                                    TroubleSgltn.Severity.WARNING,
-                                    True)
-            output = "Unable to process image file."
-            return(output, help, self.trbl.get_troubles())
 
-        if not exiv_comment:
-            exiv_comment = {'comment':'null'}
-
-        exiv_tag = {'processing_details':{
-                         'ew_file': img_file_name, 
-                         'path': image_path, 
-                         'ew_id':'ComfyUI: Plush Exif Wrangler'
-                    }
-        }
-        exiv_comm = {**exiv_comment, **exiv_tag}
-
-        self.j_mngr.log_events(f"Evaluating image file: '{os.path.basename(image_path)}'",
-                               is_trouble=True)
-
-        # Sanitize and combine data             
-        sanitized_exiv2 = {k: self.sanitize_data(v) for k, v in exiv_exif.items()} if exiv_exif else {}
-        sanitized_xmp = {k: self.sanitize_data(v) for k, v in exiv_xmp.items()} if exiv_xmp else {}
-
-        #extract the pertinent data subset from info
-        extract_values = ['widgets_values','inputs']
-        extracted_info = self.j_mngr.extract_from_dict(info, extract_values)
-        
-
-        working_meta_data = {**sanitized_xmp, **exiv_iptc,  **exiv_comm,**sanitized_exiv2, **extracted_info}
-        #End potential separate method: get_image_metadata, Returns(meta_data, info, image_path)
-
-        #Print source dict working_meta_data or info to debug issues.
-        if debug_save:
-                debug_file_name = self.j_mngr.generate_unique_filename("json", 'debug_source_file')
-                debug_file_path = self.j_mngr.append_filename_to_path(write_dir,debug_file_name)
-                #debug_json = self.j_mngr.convert_to_json_string(working_meta_data) #all data after first extraction
-                debug_json = self.j_mngr.convert_to_json_string(info) #Raw AI Gen data pre extraction, but w/o Exif info
-                self.j_mngr.write_string_to_file(debug_json,debug_file_path,False)
-        #Begin potential separate method def get_data_objects()->Tuple
-        #process user intp to list
-
-         
-        exif_keys = {'Exif.Photo.UserComment': 'User Comment',
-                        'Exif.Image.Make': 'Make',
-                        'Exif.Image.Model': 'Model',
-                        'Exif.Image.Orientation': 'Image Orientation',
-                        'Exif.Photo.PixelXDimension': 'Pixel Width',
-                        'Exif.Photo.PixelYDimension': 'Pixel Height',
-                        'Exif.Photo.ISOSpeedRatings': 'ISO',
-                        'Exif.Image.DateTime':'Created: Date_Time',
-                        'Exif.Photo.ShutterSpeedValue': 'Shutter Speed',
-                        'Exif.Photo.ExposureTime': 'Exposure Time',
-                        'Exif.Photo.Flash': "Flash",
-                        'Exif.Photo.FocalLength': 'Lens Focal Length',
-                        'Exif.Photo.FocalLengthIn35mmFilm': 'Lens 35mm Equiv. Focal Length',
-                        'Exif.Photo.ApertureValue': 'Aperture',
-                        'Exif.Photo.MaxApertureValue': 'Maximum Aperture',
-                        'Exif.Photo.FNumber': 'f-stop',
-                        'Exif.Image.Artist': 'Artist',
-                        'Exif.Image.ExposureTime': 'Exposure Time',
-                        'Exif.Image.MaxApertureValue': 'Camera Smallest Apeture',
-                        'Exif.Image.MeteringMode': 'Metering Mode',
-                        'Exif.Image.Flash': 'Flash',
-                        'Exif.Image.FocalLength': 'Focal Length',
-                        'Exif.Image.ExposureIndex': 'Exposure',
-                        'Exif.Image.ImageDescription': 'Image Description',
-                        'Xmp.OPMedia.IsHDRActive': 'HDR Active',
-                        'Xmp.crs.UprightFocalLength35mm': '35mm Equiv Focal Length',
-                        'Xmp.crs.LensProfileMatchKeyExifMake': 'Lens Make',
-                        'Xmp.crs.LensProfileMatchKeyCameraModelName': 'Lens Model',
-                        'Xmp.crs.CameraProfile': 'Camera Profile',
-                        'Xmp.crs.WhiteBalance': 'White Balance',
-                        'Xmp.xmp.CreateDate': 'Creation Date',
-                        }
-            
+        #Re-running on the same file reuses its formatted output if the filter settings are unchanged,
+        #otherwise its metadata, so changing the filters only re-runs the filtering
+        fingerprint = self.file_fingerprint(image_path)
+        output_key = (fingerprint, Min_prompt_len, Alpha_Char_Pct, Prompt_Filter_Term)
+        output = self._output_memo.get(output_key) if fingerprint else None
+        if output is not None:
+            self.j_mngr.log_events(f"Evaluating image file: '{os.path.basename(image_path)}' (unchanged, using the previous result)",
+                                   is_trouble=True)
+        else:
+            working_meta_data = self._meta_memo.get(fingerprint) if fingerprint else None
+            if working_meta_data is not None:
+                self.j_mngr.log_events(f"Evaluating image file: '{os.path.basename(image_path)}' (unchanged, using its previously read metadata)",
+                                       is_trouble=True)
+            else:
+                working_meta_data, error_output = self.get_image_metadata(image_path, pyexiv2, write_dir, debug_save)
+                if working_meta_data is None:
+                    return(error_output, help, self.trbl.get_troubles())
+                if fingerprint:
+                    self._meta_memo.put(fingerprint, working_meta_data)
 
-        #Testing translated extraction
-        translate_keys = {'widgets_values': 'Possible Prompts',
-                        'text': 'Possible Prompts',
-                        'steps': 'Steps',
-                        'cfg': 'CFG',
-                        'seed': 'Seed',
-                        'noise_seed': 'Seed',
-                        'ckpt_name': 'Models',
-                        'resolution': 'Image Size',
-                        'sampler_name': 'Sampler',
-                        'scheduler': 'Scheduler',
-                        'lora': 'Lora',
-                        'denoise': 'Denoise',
-                        'GPTmodel': 'OpenAI Model',
-                        'image_size': 'Image Size',
-                        'image_quality': 'Dall-e Image Quality',
-                        'style': 'Style',
-                        'batch_size': 'Batch Size',
-                        'ew_file': 'Source File',
-                        'ew_id': 'Processing Application'
-                        }
-        
-        all_keys = {**exif_keys, **translate_keys}
-        
-    #End potential separate method get_data_objects returns(extract_values,discard_keys, translate_keys)
-       
-        working_dict = self.j_mngr.extract_with_translation(working_meta_data,all_keys,Min_prompt_len,Alpha_Char_Pct,Prompt_Filter_Term)
-        #New step to remove possible candidate prompt duplicates
-        dedupe_keys =['Possible Prompts',]
-        self.j_mngr.remove_duplicates_from_keys(working_dict, dedupe_keys)
+            #The key translation and prompt filtering is shared with the Batch Exif Wrangler.
+            #It doesn't modify the metadata, so the memoized data is used as is
+            working_dict = translate_meta_data(working_meta_data, Min_prompt_len, Alpha_Char_Pct, Prompt_Filter_Term)
 
-        output = self.j_mngr.prep_formatted_file(working_dict)
+            output = self.j_mngr.prep_formatted_file(working_dict)
+            if fingerprint:
+                self._output_memo.put(output_key, output)
 
         if output: 
             if write_to_file and write_dir:
@@ -989,20 +1566,245 @@ class ImageInfoExtractor:
                                     True)
 
         return(output,help,self.trbl.get_troubles())
-               
-      
+
+
+class BatchImageInfoExtractor:
+#Extract the metadata of every matching image in a directory into one .jsonl or .csv file
+
+    def __init__(self):
+        self.j_mngr = json_manager()
+        self.cFig = cFigSingleton()
+        self.help_data = helpSgltn()
+        self.trbl = TroubleSgltn()
+
+
+    def list_files(self, directory:str, file_pattern:str, recursive:bool)-> list:
+        """
+        Finds the image files to process.
+
+        Args:
+            directory (str): The directory to search, relative paths are relative to the ComfyUI input directory
+            file_pattern (str): One or more glob patterns separated by commas, e.g. '*.png, *.jpg'
+            recursive (bool): Also search sub-directories
+
+        Returns:
+            list: Sorted, unique file paths
+        """
+        search_dir = os.path.join(folder_paths.get_input_directory(), directory.strip()) if directory else folder_paths.get_input_directory()
+        if not os.path.isdir(search_dir):
+            self.j_mngr.log_events(f"Directory not found: {search_dir}",
+                                   TroubleSgltn.Severity.ERROR,
+                                   True)
+            return []
+        patterns = [pattern.strip() for pattern in file_pattern.split(',') if pattern.strip()] or ['*']
+        files = set()
+        for pattern in patterns:
+            matches = Path(search_dir).rglob(pattern) if recursive else Path(search_dir).glob(pattern)
+            files.update(str(match) for match in matches if match.is_file())
+        return sorted(files)
+
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {
+                    "directory": ("STRING", {"multiline": False, "default": ""}),
+                    "file_pattern": ("STRING", {"multiline": False, "default": "*.png, *.jpg, *.jpeg"}),
+                    "recursive": ("BOOLEAN", {"default": False}),
+                    "output_format": (["JSONL", "CSV"], {"default": "JSONL"}),
+                    "file_prefix": ("STRING",{"default": "MetaData_"}),
+                    "Min_prompt_len": ("INT", {"max": 2500, "min": 3, "step": 1, "default": 72, "display": "number"}),
+                    "Alpha_Char_Pct": ("FLOAT", {"max": 1.001, "min": 0.01, "step": 0.01, "display": "number", "round": 0.01, "default": 0.90}),
+                    "Prompt_Filter_Term": ("STRING", {"multiline": False, "default": ""}),
+                    "max_workers": ("INT", {"max": 32, "min": 1, "step": 1, "default": 4, "display": "number"}),
+                    "use_processes": ("BOOLEAN", {"default": True})
+                },
+        }
+
+    CATEGORY = "Plush/Utils"
+
+    RETURN_TYPES = ("STRING","STRING","STRING")
+    RETURN_NAMES = ("output_file","help","troubleshooting")
+
+    FUNCTION = "gogo"
+
+    OUTPUT_NODE = True
+
+    def gogo(self, directory, file_pattern, recursive, output_format, file_prefix, Min_prompt_len, Alpha_Char_Pct,
+             Prompt_Filter_Term, max_workers, use_processes):
+
+        self.trbl.reset('Batch Exif Wrangler')
+        help = self.help_data.batch_exif_wrangler_help
+        output_file = ""
+
+        if not self.cFig.pyexiv2:
+            self.j_mngr.log_events("Unable to load supporting library 'pyexiv2'.  This node is not functional.",
+                                   TroubleSgltn.Severity.ERROR,
+                                   True)
+            return(output_file, help, self.trbl.get_troubles())
+
+        write_dir = ''
+        comfy_dir = self.j_mngr.find_target_directory(self.j_mngr.script_dir, 'ComfyUI')
+        if comfy_dir:
+            output_dir = self.j_mngr.find_child_directory(comfy_dir,'output')
+            if output_dir:
+                write_dir = self.j_mngr.find_child_directory(output_dir, 'PlushFiles',True)
+        if not write_dir:
+            self.j_mngr.log_events('Unable to find or create PlushFiles directory. Unable to write files',
+                                   TroubleSgltn.Severity.ERROR,
+                                   True)
+            return(output_file, help, self.trbl.get_troubles())
+
+        files = self.list_files(directory, file_pattern, recursive)
+        if not files:
+            self.j_mngr.log_events(f"No files matching '{file_pattern}' were found",
+                                   TroubleSgltn.Severity.WARNING,
+                                   True)
+            return(output_file, help, self.trbl.get_troubles())
+        self.j_mngr.log_events(f"Extracting metadata from {len(files)} files",
+                               is_trouble=True)
+
+        is_csv = output_format == "CSV"
+        output_file = self.j_mngr.append_filename_to_path(write_dir,
+                                                          self.j_mngr.generate_unique_filename("csv" if is_csv else "jsonl", file_prefix + '_ew_batch_'))
+        worker_args = (Min_prompt_len, Alpha_Char_Pct, Prompt_Filter_Term)
+        pbar = comfy.utils.ProgressBar(len(files))
+        counts = {'written': 0, 'empty': 0, 'failed': 0}
+
+        start_time = time.perf_counter()
+        with open(output_file, 'w', encoding='utf-8', newline='') as out:
+            csv_writer = csv.DictWriter(out, fieldnames=['path'] + FRIENDLY_NAMES, extrasaction='ignore') if is_csv else None
+            if csv_writer:
+                csv_writer.writeheader()
+
+            def handle_result(result):
+                #Each file is written as soon as its result arrives, so nothing accumulates in memory
+                pbar.update(1)
+                if 'error' in result:
+                    counts['failed'] += 1
+                    if counts['failed'] <= 10:
+                        self.j_mngr.log_events(f"Unable to process '{result['path']}': {result['error']}",
+                                               TroubleSgltn.Severity.WARNING,
+                                               True)
+                    if not csv_writer:
+                        out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                    return
+                if not result['data']:
+                    counts['empty'] += 1
+                if csv_writer:
+                    csv_writer.writerow({'path': result['path'], **{k: flatten_value(v) for k, v in result['data'].items()}})
+                else:
+                    out.write(json.dumps({'path': result['path'], **result['data']}, ensure_ascii=False, default=str) + '\n')
+                counts['written'] += 1
+
+            processed = extract_files(files, worker_args, max_workers, use_processes, handle_result)
+
+        elapsed = time.perf_counter() - start_time
+        rate = processed / elapsed if elapsed > 0 else 0
+        self.j_mngr.log_events(f"Processed {processed} files in {elapsed:.1f}s ({rate:.1f} files/sec): {counts['written']} written, {counts['empty']} without metadata, {counts['failed']} failed",
+                               is_trouble=True)
+        self.j_mngr.log_events(f"Metadata written to: {output_file}",
+                               is_trouble=True)
+
+        return(output_file, help, self.trbl.get_troubles())
+
+
+class MetadataSearch:
+#Search the metadata index of the ComfyUI input and output images
+
+    def __init__(self):
+        self.j_mngr = json_manager()
+        self.cFig = cFigSingleton()
+        self.help_data = helpSgltn()
+        self.trbl = TroubleSgltn()
+
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {"required": {
+                    "query": ("STRING", {"multiline": False, "default": ""}),
+                    "field": (list(MetadataIndex.FIELDS), {"default": "All"}),
+                    "folders": (["Input", "Output", "Input and Output"], {"default": "Output"}),
+                    "refresh_index": ("BOOLEAN", {"default": True}),
+                    "max_results": ("INT", {"max": 500, "min": 1, "step": 1, "default": 20, "display": "number"}),
+                    "max_workers": ("INT", {"max": 32, "min": 1, "step": 1, "default": 4, "display": "number"})
+                },
+        }
+
+    CATEGORY = "Plush/Utils"
+
+    RETURN_TYPES = ("STRING","STRING","STRING","STRING")
+    RETURN_NAMES = ("matches","file_paths","help","troubleshooting")
+
+    FUNCTION = "gogo"
+
+    OUTPUT_NODE = True
+
+    def gogo(self, query, field, folders, refresh_index, max_results, max_workers):
+
+        self.trbl.reset('Metadata Search')
+        help = self.help_data.metadata_search_help
+        output = "No matches were found"
+        file_paths = ""
+
+        if not self.cFig.pyexiv2:
+            self.j_mngr.log_events("Unable to load supporting library 'pyexiv2'.  This node is not functional.",
+                                   TroubleSgltn.Severity.ERROR,
+                                   True)
+            return(output, file_paths, help, self.trbl.get_troubles())
+
+        directories = []
+        if folders in ("Input", "Input and Output"):
+            directories.append(folder_paths.get_input_directory())
+        if folders in ("Output", "Input and Output"):
+            directories.append(folder_paths.get_output_directory())
+
+        index = MetadataIndex()
+        if refresh_index:
+            pbar = None
+
+            def progress(amount):
+                nonlocal pbar
+                if pbar is None:
+                    pbar = comfy.utils.ProgressBar(max(1, amount))
+                else:
+                    pbar.update(amount)
+
+            start_time = time.perf_counter()
+            counts = index.refresh(directories, max_workers, progress=progress)
+            self.j_mngr.log_events(f"Index refreshed in {time.perf_counter() - start_time:.2f}s: {counts['scanned']} files checked, {counts['parsed']} parsed, {counts['removed']} removed, {counts['failed']} unreadable",
+                                   is_trouble=True)
+
+        if not query.strip():
+            self.j_mngr.log_events("Enter a word or phrase to search for",
+                                   TroubleSgltn.Severity.WARNING,
+                                   True)
+            return(output, file_paths, help, self.trbl.get_troubles())
+
+        matches = index.search(query, field, max_results, tuple(directories))
+        if matches:
+            output = "\n\n".join(f"➤ {path}\n{self.j_mngr.prep_formatted_file(data)}" for path, data in matches)
+            file_paths = "\n".join(path for path, _ in matches)
+
+        return(output, file_paths, help, self.trbl.get_troubles())
+
 
 # A dictionary that contains all nodes you want to export with their names
 # NOTE: names should be globally unique
 NODE_CLASS_MAPPINGS = {
     "Enhancer": Enhancer,
+    "BatchEnhancer": BatchEnhancer,
     "DalleImage": DalleImage,
-    "Plush-Exif Wrangler" :ImageInfoExtractor
+    "Plush-Exif Wrangler" :ImageInfoExtractor,
+    "Plush-Batch Exif Wrangler": BatchImageInfoExtractor,
+    "Plush-Metadata Search": MetadataSearch
 }
 
 # A dictionary that contains the friendly/humanly readable titles for the nodes
 NODE_DISPLAY_NAME_MAPPINGS = {
     "Enhancer": "Style Prompt",
+    "BatchEnhancer": "Batch Style Prompt",
     "DalleImage": "OAI Dall_e Image",
-    "ImageInfoExtractor": "Exif Wrangler"
+    "ImageInfoExtractor": "Exif Wrangler",
+    "Plush-Batch Exif Wrangler": "Batch Exif Wrangler",
+    "Plush-Metadata Search": "Metadata Search"
 }
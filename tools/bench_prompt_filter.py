@@ -0,0 +1,130 @@
+"""
+Benchmarks the Possible Prompt filter used by Exif Wrangler against the implementation it replaced.
+
+The candidate strings are the widget values and inputs of real workflows: by default the ones saved in the
+Example_Workflows images, or any ComfyUI PNG or workflow .json files given on the command line.  Each workflow
+is repeated with numbered copies of its strings so the filter scores thousands of distinct candidates.
+
+    python tools/bench_prompt_filter.py [files...] [--copies 200] [--min-len 20] [--alpha-pct 0.8] [--filter-term ""]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from mng_json import PromptFilter  # noqa: E402
+
+
+def legacy_filter_prompt_items(items, min_prompt_len, alpha_pct, filter_phrase):
+    #The filter as it was before PromptFilter, kept here to check the results match
+    filtered_items = []
+    filter_phrase_lower = filter_phrase.lower()
+
+    def calculate_prompt_char_ratio(s: str) -> float:
+        alpha_space_count = sum(c.isalpha() or c.isspace() or c == ',' for c in s)
+        return alpha_space_count / len(s) if s else 0
+
+    def filter_recursive(item):
+        if isinstance(item, str):
+            if len(item.strip()) >= min_prompt_len and calculate_prompt_char_ratio(item) >= alpha_pct and filter_phrase_lower in item.lower():
+                return item
+        elif isinstance(item, list):
+            filtered_sublist = [filter_recursive(subitem) for subitem in item]
+            filtered_sublist = [subitem for subitem in filtered_sublist if subitem is not None]
+            if filtered_sublist:
+                return filtered_sublist
+        return None
+
+    for item in items:
+        result = filter_recursive(item)
+        if result is not None:
+            filtered_items.append(result)
+    return filtered_items
+
+
+def read_workflow_text(path: str) -> list:
+    #The JSON text of a workflow file, or of the prompt and workflow saved in a PNG
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as file:
+            return [file.read()]
+    from PIL import Image
+    with Image.open(path) as img:
+        return [value for value in img.info.values() if isinstance(value, str)]
+
+
+def candidate_lists(text: str) -> list:
+    #The lists the filter is given: every 'widgets_values' and 'inputs' value, as extract_from_dict finds them
+    found = []
+    try:
+        stack = [json.loads(text)]
+    except json.JSONDecodeError:
+        return found
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key in ('widgets_values', 'inputs'):
+                    found.append(list(value.values()) if isinstance(value, dict) else value)
+                stack.append(value)
+        elif isinstance(node, list):
+            stack.extend(node)
+    return found
+
+
+def make_copies(lists: list, copies: int) -> list:
+    #Numbered copies make every string distinct, so the per-string verdict cache isn't what's being timed
+    return [[f"{item} {n}" if isinstance(item, str) else item for item in values]
+            for n in range(copies) for values in lists]
+
+
+def best_time(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help="ComfyUI PNG or workflow .json files")
+    parser.add_argument('--copies', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-len', type=int, default=20)
+    parser.add_argument('--alpha-pct', type=float, default=0.8)
+    parser.add_argument('--filter-term', default="")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(REPO_DIR, 'Example_Workflows', '*.png')))
+    lists = [values for path in files for text in read_workflow_text(path) for values in candidate_lists(text)]
+    lists = make_copies(lists, args.copies)
+    strings = sum(isinstance(item, str) for values in lists for item in values)
+    print(f"{len(files)} files, {len(lists)} candidate lists, {strings} strings")
+
+    filter_args = (args.min_len, args.alpha_pct, args.filter_term)
+
+    def legacy():
+        return [legacy_filter_prompt_items(values, *filter_args) for values in lists]
+
+    def current():
+        #One PromptFilter per extract_with_translation call, so one per run here
+        prompt_filter = PromptFilter(*filter_args)
+        return [prompt_filter.filter(values) for values in lists]
+
+    if legacy() != current():
+        sys.exit("Results differ from the legacy filter")
+
+    legacy_time = best_time(legacy, args.repeat)
+    current_time = best_time(current, args.repeat)
+    print(f"legacy:  {legacy_time * 1000:8.1f}ms")
+    print(f"current: {current_time * 1000:8.1f}ms  ({legacy_time / current_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()